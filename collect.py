@@ -6,6 +6,10 @@ import sys
 import os
 import json
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -14,10 +18,15 @@ sys.path.insert(0, script_dir)
 
 import argparse
 import yaml
-from src.youtube_client import YouTubeAPIClient
+from src.youtube_client import YouTubeAPIClient, comments_from_threads
 from src.database import Database
 from src.utils.helpers import load_sources_from_csv, extract_channel_id_from_url, setup_logging
 
+# Write batches (one per video page or video) a channel worker may hand over
+# before it waits for the main thread to save them; bounds the memory held by
+# channels running ahead of the one being saved
+_HANDOFF_BATCHES = 32
+
 class ComprehensiveCollector:
     """Comprehensive data collector with robust error handling"""
     
@@ -42,6 +51,9 @@ class ComprehensiveCollector:
 
         # Initialize components with quota tracking
         self.run_id = None  # Will be set when collection starts
+        self.prefetched_channels = {}  # channel_id -> channel info, filled by run()
+        self._local = threading.local()  # pending_writes/pending_stats of the channel worker thread
+        self._stop = threading.Event()  # Set when run() stops; channel workers give up
         self.youtube_client = YouTubeAPIClient(
             api_key=self.config['api']['youtube_api_key'],
             max_retries=self.config['api']['max_retries'],
@@ -91,11 +103,139 @@ class ComprehensiveCollector:
 
         return True, current_quota
     
+    def _write(self, method, *args):
+        """Run a database write, or queue it for the main thread when called from a channel worker"""
+        pending = getattr(self._local, 'pending_writes', None)
+        if pending is None:
+            return method(*args)
+        pending.append((method, args))
+        return True
+    
+    def _transaction(self):
+        """Database transaction on the main thread; in a channel worker, the block's writes are handed over as one batch"""
+        if getattr(self._local, 'pending_writes', None) is None:
+            return self.db.transaction()
+        return self._handoff_block()
+    
+    @contextmanager
+    def _handoff_block(self):
+        """Hand a worker's writes to the main thread when the block ends (dropping the block's own writes on error)"""
+        pending = self._local.pending_writes
+        start = len(pending)
+        try:
+            yield
+        except Exception:
+            del pending[start:]
+            raise
+        finally:
+            self._hand_off(None)
+    
+    def _hand_off(self, done):
+        """
+        Pass a channel worker's queued writes to the main thread
+        
+        done is None for a batch in the middle of the channel, or
+        (success, stats updates) once the channel is finished. Waits while the
+        handoff queue is full; gives up if the collection is stopping.
+        """
+        writes = self._local.pending_writes
+        if not writes and done is None:
+            return
+        self._local.pending_writes = []
+        while not self._stop.is_set():
+            try:
+                self._local.handoff.put((writes, done), timeout=1.0)
+                return
+            except queue.Full:
+                pass
+    
+    def _update_stats(self, update):
+        """Run a stats update, or queue it with the channel's writes when called from a channel worker"""
+        pending = getattr(self._local, 'pending_stats', None)
+        if pending is None:
+            update()
+        else:
+            pending.append(update)
+    
+    def _count(self, **increments):
+        """Add to stats counters"""
+        def update():
+            for key, n in increments.items():
+                self.stats[key] += n
+        self._update_stats(update)
+    
+    def _channel_failed(self):
+        """Count a failed channel"""
+        self._count(channels_failed=1, consecutive_failures=1)
+    
+    def _channel_succeeded(self):
+        """Count a successful channel"""
+        def update():
+            self.stats['channels_success'] += 1
+            self.stats['consecutive_failures'] = 0  # Reset on success
+        self._update_stats(update)
+    
+    def _collect_channel_deferred(self, source, index, total, handoff):
+        """collect_channel for a worker thread; writes and stats updates are passed through handoff"""
+        self._local.handoff = handoff
+        self._local.pending_writes = []
+        self._local.pending_stats = []
+        success = False
+        try:
+            success = self.collect_channel(source, index, total)
+        finally:
+            self._hand_off((success, self._local.pending_stats))
+            self._local.pending_writes = None
+            self._local.pending_stats = None
+            self._local.handoff = None
+    
+    def _collect_in_order(self, executor, parallel, futures, sources, idx, start_from):
+        """
+        Collect channel idx, keeping the next channels running ahead in worker threads
+        
+        Workers only call the API; their database writes are applied here, on
+        the main thread and in source order, one transaction per video page or
+        video as with sequential collection. Channels running ahead hold at most
+        _HANDOFF_BATCHES batches until their turn. Stats updates are applied
+        once the channel is finished. Called once run() has checked the quota
+        for channel idx.
+        """
+        total = start_from + len(sources)
+        if executor is None:
+            return self.collect_channel(sources[idx - start_from - 1], idx, total)
+        
+        for ahead in range(idx, min(idx + parallel, total + 1)):
+            if ahead in futures:
+                continue
+            # Don't start channels the quota check in run() would stop before
+            if ahead > idx and not self.check_quota_available()[0]:
+                break
+            handoff = queue.Queue(maxsize=_HANDOFF_BATCHES)
+            futures[ahead] = (executor.submit(self._collect_channel_deferred,
+                                              sources[ahead - start_from - 1], ahead, total, handoff),
+                              handoff)
+        
+        future, handoff = futures.pop(idx)
+        done = None
+        while done is None:
+            writes, done = handoff.get()
+            with self.db.transaction():
+                for method, args in writes:
+                    method(*args)
+                self.db.flush()  # Quota rows the workers buffered
+        future.result()
+        
+        success, stats_updates = done
+        for update in stats_updates:
+            update()
+        return success
+    
     def save_checkpoint(self, channel_index, source):
         """Save progress checkpoint"""
-        # Update stats with current quota
+        # Update stats with current quota, and persist the matching quota rows
         self.stats['quota_used'] = self.youtube_client.get_quota_usage()
         self.stats['quota_cumulative'] = self.youtube_client.get_quota_cumulative()
+        self.youtube_client.flush_quota()
 
         checkpoint = {
             'channel_index': channel_index,
@@ -117,15 +257,16 @@ class ComprehensiveCollector:
                 return json.load(f)
         return None
     
-    def collect_all_videos(self, channel_id):
+    def collect_all_videos(self, channel_id, channel_info=None):
         """Collect ALL videos from a channel (no limit)"""
         print(f"      Collecting ALL videos from channel...")
         videos = []
         page_count = 0
         
         try:
-            # Get channel info for uploads playlist
-            channel_info = self.youtube_client.get_channel_info(channel_id)
+            # Get channel info for uploads playlist (unless the caller already has it)
+            if channel_info is None:
+                channel_info = self.youtube_client.get_channel_info(channel_id)
             if not channel_info:
                 return []
             
@@ -138,6 +279,8 @@ class ComprehensiveCollector:
                 if not quota_ok:
                     print(f"      ⚠ Quota limit reached during video collection")
                     return videos
+                if self._stop.is_set():
+                    return videos
                 
                 # Get playlist page
                 request_params = {
@@ -148,22 +291,23 @@ class ComprehensiveCollector:
                 if next_page_token:
                     request_params['pageToken'] = next_page_token
                 
-                # Use the youtube client's _make_request to track quota
-                request = self.youtube_client.youtube.playlistItems().list(**request_params)
-                response = self.youtube_client._make_request(lambda: request.execute(), quota_cost=1, api_method='playlistItems.list')
-                
-                page_items = response.get('items', [])
-                video_ids = [item['contentDetails']['videoId'] for item in page_items]
-                
-                if video_ids:
-                    # Get detailed video info
-                    detailed = self.youtube_client.get_video_details(video_ids)
-                    videos.extend(detailed)
+                # One commit per page: quota tracking rows + video details
+                with self._transaction():
+                    # Use the youtube client's _make_request to track quota
+                    request = self.youtube_client.youtube.playlistItems().list(**request_params)
+                    response = self.youtube_client._make_request(request, quota_cost=1, api_method='playlistItems.list')
+                    
+                    page_items = response.get('items', [])
+                    video_ids = [item['contentDetails']['videoId'] for item in page_items]
                     
-                    # Save to database immediately
-                    for video in detailed:
+                    if video_ids:
+                        # Get detailed video info
+                        detailed = self.youtube_client.get_video_details(video_ids)
+                        videos.extend(detailed)
+                        
+                        # Save to database immediately
                         if self.output_config.get('save_to_database', True):
-                            self.db.insert_video(video)
+                            self._write(self.db.insert_videos_batch, detailed)
                 
                 page_count += 1
                 print(f"      Videos collected: {len(videos)} (page {page_count})", end='\r')
@@ -193,6 +337,8 @@ class ComprehensiveCollector:
                 if not quota_ok:
                     print(f"        ⚠ Quota limit reached during comment collection")
                     break
+                if self._stop.is_set():
+                    break
                 
                 request_params = {
                     'part': 'snippet,replies',
@@ -206,42 +352,9 @@ class ComprehensiveCollector:
                 
                 # Use the youtube client's _make_request to track quota
                 request = self.youtube_client.youtube.commentThreads().list(**request_params)
-                response = self.youtube_client._make_request(lambda: request.execute(), quota_cost=1, api_method='commentThreads.list')
+                response = self.youtube_client._make_request(request, quota_cost=1, api_method='commentThreads.list')
                 
-                for item in response.get('items', []):
-                    # Top-level comment
-                    top_comment = item['snippet']['topLevelComment']['snippet']
-                    comment_data = {
-                        'comment_id': item['snippet']['topLevelComment']['id'],
-                        'video_id': video_id,
-                        'text': top_comment['textDisplay'],
-                        'author': top_comment['authorDisplayName'],
-                        'author_channel_id': top_comment.get('authorChannelId', {}).get('value'),
-                        'like_count': top_comment['likeCount'],
-                        'published_at': top_comment['publishedAt'],
-                        'updated_at': top_comment['updatedAt'],
-                        'parent_id': None,
-                        'reply_count': item['snippet']['totalReplyCount']
-                    }
-                    comments.append(comment_data)
-                    
-                    # Add replies
-                    if 'replies' in item:
-                        for reply in item['replies']['comments']:
-                            reply_snippet = reply['snippet']
-                            reply_data = {
-                                'comment_id': reply['id'],
-                                'video_id': video_id,
-                                'text': reply_snippet['textDisplay'],
-                                'author': reply_snippet['authorDisplayName'],
-                                'author_channel_id': reply_snippet.get('authorChannelId', {}).get('value'),
-                                'like_count': reply_snippet['likeCount'],
-                                'published_at': reply_snippet['publishedAt'],
-                                'updated_at': reply_snippet['updatedAt'],
-                                'parent_id': comment_data['comment_id'],
-                                'reply_count': 0
-                            }
-                            comments.append(reply_data)
+                comments.extend(comments_from_threads(response.get('items', []), video_id))
                 
                 next_page_token = response.get('nextPageToken')
                 if not next_page_token:
@@ -252,7 +365,7 @@ class ComprehensiveCollector:
             
             # Save all comments
             if comments and self.output_config.get('save_to_database', True):
-                self.db.insert_comments_batch(comments)
+                self._write(self.db.insert_comments_batch, comments)
             
             return comments
             
@@ -267,23 +380,23 @@ class ComprehensiveCollector:
         print(f"    URL: {source.get('youtube_url', 'No URL')}")
         
         # Increment attempted counter - this channel is being processed
-        self.stats['channels_attempted'] += 1
+        self._count(channels_attempted=1)
         
         try:
             # Extract channel ID
             channel_id = extract_channel_id_from_url(source.get('youtube_url', ''))
             if not channel_id:
                 print("    ✗ Could not extract channel ID")
-                self.stats['channels_failed'] += 1
-                self.stats['consecutive_failures'] += 1
+                self._channel_failed()
                 return False
             
-            # Get channel info
-            channel_info = self.youtube_client.get_channel_info(channel_id)
+            # Get channel info (batch-fetched up front when the URL had a channel ID)
+            channel_info = self.prefetched_channels.pop(channel_id, None)
+            if channel_info is None:
+                channel_info = self.youtube_client.get_channel_info(channel_id)
             if not channel_info:
                 print("    ✗ Could not retrieve channel info (deleted/private/suspended)")
-                self.stats['channels_failed'] += 1
-                self.stats['consecutive_failures'] += 1
+                self._channel_failed()
                 return False
             
             print(f"    ✓ Channel: {channel_info['snippet']['title']}")
@@ -291,16 +404,15 @@ class ComprehensiveCollector:
             
             # Save channel
             if self.output_config.get('save_to_database', True):
-                self.db.insert_channel(channel_info)
+                self._write(self.db.insert_channel, channel_info)
             
             # Collect ALL videos
-            videos = self.collect_all_videos(channel_info['id'])
-            self.stats['videos_collected'] += len(videos)
+            videos = self.collect_all_videos(channel_info['id'], channel_info)
+            self._count(videos_collected=len(videos))
             
             if not videos:
                 print("    ⚠ No videos found")
-                self.stats['channels_success'] += 1
-                self.stats['consecutive_failures'] = 0  # Reset on success
+                self._channel_succeeded()
                 return True
             
             # Collect comments from ALL videos
@@ -313,8 +425,12 @@ class ComprehensiveCollector:
                 if not quota_ok:
                     print(f"      ⚠ Quota limit reached at video {vid_idx}/{len(videos)}")
                     break
+                if self._stop.is_set():
+                    break
                 
-                comments = self.collect_all_comments(video['id'])
+                # One commit per video: comment pages' quota rows + comments
+                with self._transaction():
+                    comments = self.collect_all_comments(video['id'])
                 video_comments += len(comments)
                 
                 if (vid_idx % 10) == 0 or vid_idx == len(videos):
@@ -324,21 +440,20 @@ class ComprehensiveCollector:
                 time.sleep(delay)
             
             print(f"      Progress: {len(videos)}/{len(videos)} videos, {video_comments} comments (COMPLETE)" + " " * 20)
-            self.stats['comments_collected'] += video_comments
+            self._count(comments_collected=video_comments)
             
             # Update quota - track both session and cumulative
-            self.stats['quota_used'] = self.youtube_client.get_quota_usage()
-            self.stats['quota_cumulative'] = self.youtube_client.get_quota_cumulative()
-            print(f"    Session quota: {self.stats['quota_used']:,} | Cumulative: {self.stats['quota_cumulative']:,} units")
+            quota_used = self.youtube_client.get_quota_usage()
+            quota_cumulative = self.youtube_client.get_quota_cumulative()
+            self._update_stats(lambda: self.stats.update(quota_used=quota_used, quota_cumulative=quota_cumulative))
+            print(f"    Session quota: {quota_used:,} | Cumulative: {quota_cumulative:,} units")
             
-            self.stats['channels_success'] += 1
-            self.stats['consecutive_failures'] = 0  # Reset on success
+            self._channel_succeeded()
             return True
             
         except Exception as e:
             print(f"    ✗ Unexpected error: {e}")
-            self.stats['channels_failed'] += 1
-            self.stats['consecutive_failures'] += 1
+            self._channel_failed()
             return False
     
     def run(self, sources_csv, start_from=0, max_channels=None, resume=False):
@@ -419,6 +534,16 @@ class ComprehensiveCollector:
         # Track which sources we're actually processing
         channels_to_process = len(sources)
         
+        # Resolve channel IDs 50 per request instead of one request per channel;
+        # handles and custom names are still resolved individually
+        channel_ids = [extract_channel_id_from_url(source.get('youtube_url', '')) for source in sources]
+        self.prefetched_channels = self.youtube_client.get_channels_info(channel_ids)
+        
+        # Channels collected at once; API calls overlap, database writes stay on this thread
+        parallel = max(1, self.collection_config.get('parallel_channels') or 1)
+        executor = ThreadPoolExecutor(max_workers=parallel) if parallel > 1 else None
+        futures = {}  # channel index -> (future, handoff queue) of a channel running ahead
+        
         try:
             for idx, source in enumerate(sources, start=start_from + 1):
                 try:
@@ -439,7 +564,7 @@ class ComprehensiveCollector:
                         break
                     
                     # Attempt to collect this channel (never raises exceptions)
-                    success = self.collect_channel(source, idx, start_from + len(sources))
+                    success = self._collect_in_order(executor, parallel, futures, sources, idx, start_from)
                     
                     # Check consecutive failures
                     max_failures = self.error_config.get('max_consecutive_failures', 5)
@@ -466,8 +591,7 @@ class ComprehensiveCollector:
                     print("   Continuing to next channel...")
                     import traceback
                     traceback.print_exc()
-                    self.stats['channels_failed'] += 1
-                    self.stats['consecutive_failures'] += 1
+                    self._channel_failed()
                     time.sleep(2)  # Brief pause before continuing
             
             # Summary
@@ -514,6 +638,7 @@ class ComprehensiveCollector:
                 print("✓ Checkpoint cleared (collection complete)")
             
         except KeyboardInterrupt:
+            self._stop.set()
             print("\n\n⚠ Collection interrupted by user")
             print("Saving checkpoint...")
             self.save_checkpoint(idx if 'idx' in locals() else start_from, 
@@ -559,9 +684,14 @@ class ComprehensiveCollector:
             self.db.end_collection_run(run_id, db_stats)
         
         finally:
+            if executor is not None:
+                # Channels still running ahead are dropped unsaved (a resume redoes
+                # them); don't wait for them to spend more quota
+                self._stop.set()
+                executor.shutdown(wait=False, cancel_futures=True)
             self.db.close()
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Comprehensive YouTube Data Collector (Robust)')
     parser.add_argument('--sources', type=str, required=True,
                        help='Path to CSV file with source data')
@@ -574,7 +704,7 @@ def main():
     parser.add_argument('--resume', action='store_true',
                        help='Resume from last checkpoint')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     collector = ComprehensiveCollector(config_path=args.config)
     collector.run(
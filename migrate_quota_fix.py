@@ -40,20 +40,15 @@ def migrate_database():
         print("   Creating quota_tracking table...")
         cursor.execute("""
             CREATE TABLE quota_tracking (
-                track_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 run_id INTEGER,
-                timestamp TEXT,
+                track_id INTEGER,
+                ts INTEGER,
                 api_method TEXT,
                 quota_cost INTEGER,
                 details TEXT,
+                PRIMARY KEY (run_id, track_id),
                 FOREIGN KEY (run_id) REFERENCES collection_runs (run_id)
-            )
-        """)
-
-        # Create index for better performance
-        cursor.execute("""
-            CREATE INDEX idx_quota_tracking_run
-            ON quota_tracking(run_id)
+            ) WITHOUT ROWID
         """)
 
         conn.commit()
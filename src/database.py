@@ -5,13 +5,145 @@ Handles data persistence using SQLite or PostgreSQL
 
 import sqlite3
 import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 import json
 
+from src.utils.helpers import parse_duration_seconds
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+if orjson is not None:
+    def _jdumps(obj) -> str:
+        """Serialize to a JSON string (orjson)"""
+        return orjson.dumps(obj).decode()
+else:
+    _jdumps = json.dumps
+
+# Serialized empty list, reused instead of calling json.dumps([]) per row
+_EMPTY_JSON = '[]'
+
+# Maximum number of rows kept by the get_channel_by_id cache
+_CHANNEL_CACHE_SIZE = 4096
+
+# Buffered quota_tracking rows are written once either limit is reached
+_QUOTA_FLUSH_ROWS = 128
+_QUOTA_FLUSH_SECONDS = 5.0
+
+# Run maintenance() after every N completed collection runs
+_MAINTENANCE_EVERY_N_RUNS = 10
+
+# Upserts update rows in place (ON CONFLICT DO UPDATE) rather than
+# INSERT OR REPLACE, which deletes and re-inserts the row.
+_SQL_INSERT_CHANNEL = """
+    INSERT INTO channels (
+        channel_id, channel_title, description, custom_url,
+        published_at, country, subscriber_count, video_count, view_count,
+        topic_categories, keywords, branding_keywords, first_collected_at,
+        last_updated_at, source_domain, source_rating, source_orientation
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(channel_id) DO UPDATE SET
+        channel_title = excluded.channel_title,
+        description = excluded.description,
+        custom_url = excluded.custom_url,
+        published_at = excluded.published_at,
+        country = excluded.country,
+        subscriber_count = excluded.subscriber_count,
+        video_count = excluded.video_count,
+        view_count = excluded.view_count,
+        topic_categories = excluded.topic_categories,
+        keywords = excluded.keywords,
+        branding_keywords = excluded.branding_keywords,
+        last_updated_at = excluded.last_updated_at,
+        source_domain = excluded.source_domain,
+        source_rating = excluded.source_rating,
+        source_orientation = excluded.source_orientation
+"""
+
+_SQL_INSERT_VIDEO = """
+    INSERT INTO videos (
+        video_id, channel_id, title, description, published_at,
+        duration, duration_seconds, category_id, default_language,
+        default_audio_language, view_count, like_count, comment_count,
+        tags, topic_categories, made_for_kids, has_captions,
+        thumbnail_url, collected_at
+    ) VALUES (
+        :video_id, :channel_id, :title, :description, :published_at,
+        :duration, :duration_seconds, :category_id, :default_language,
+        :default_audio_language, :view_count, :like_count, :comment_count,
+        :tags, :topic_categories, :made_for_kids, :has_captions,
+        :thumbnail_url, :collected_at
+    )
+    ON CONFLICT(video_id) DO UPDATE SET
+        channel_id = excluded.channel_id,
+        title = excluded.title,
+        description = excluded.description,
+        published_at = excluded.published_at,
+        duration = excluded.duration,
+        duration_seconds = excluded.duration_seconds,
+        category_id = excluded.category_id,
+        default_language = excluded.default_language,
+        default_audio_language = excluded.default_audio_language,
+        view_count = excluded.view_count,
+        like_count = excluded.like_count,
+        comment_count = excluded.comment_count,
+        tags = excluded.tags,
+        topic_categories = excluded.topic_categories,
+        made_for_kids = excluded.made_for_kids,
+        has_captions = excluded.has_captions,
+        thumbnail_url = excluded.thumbnail_url,
+        collected_at = excluded.collected_at
+"""
+
+_SQL_INSERT_COMMENT = """
+    INSERT INTO comments (
+        comment_id, video_id, parent_id, author_name, author_channel_id,
+        text, like_count, reply_count, published_at, updated_at, collected_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(comment_id) DO UPDATE SET
+        video_id = excluded.video_id,
+        parent_id = excluded.parent_id,
+        author_name = excluded.author_name,
+        author_channel_id = excluded.author_channel_id,
+        text = excluded.text,
+        like_count = excluded.like_count,
+        reply_count = excluded.reply_count,
+        published_at = excluded.published_at,
+        updated_at = excluded.updated_at,
+        collected_at = excluded.collected_at
+"""
+
+_SQL_INSERT_QUOTA = """
+    INSERT INTO quota_tracking (run_id, track_id, ts, api_method, quota_cost, details)
+    VALUES (?, (SELECT COALESCE(MAX(track_id), 0) + 1 FROM quota_tracking WHERE run_id = ?),
+            ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_CAPTION_TRACK = """
+    INSERT INTO caption_tracks (
+        caption_id, video_id, language, language_name,
+        track_kind, is_auto_generated, collected_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(caption_id) DO UPDATE SET
+        video_id = excluded.video_id,
+        language = excluded.language,
+        language_name = excluded.language_name,
+        track_kind = excluded.track_kind,
+        is_auto_generated = excluded.is_auto_generated,
+        collected_at = excluded.collected_at
+"""
+
+
 class Database:
     """Database handler for YouTube monitoring data"""
     
@@ -22,24 +154,143 @@ class Database:
         Args:
             db_path: Path to SQLite database file
         """
+        self._init_state(db_path)
+        self._connect()
+        self._create_tables()
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, db_path: str = ":memory:") -> "Database":
+        """
+        Wrap an open connection whose schema is already in place
+
+        E.g. a copy of a template database made with Connection.backup(),
+        which skips the schema setup.
+
+        Args:
+            conn: SQLite connection; the returned Database owns it from now on
+            db_path: Path the connection was opened with (selects its pragmas)
+
+        Returns:
+            Database using conn
+        """
+        db = cls.__new__(cls)
+        db._init_state(db_path)
+        db.conn = conn
+        db._configure()
+        return db
+
+    def _init_state(self, db_path: str):
+        """Set the attributes every Database starts with"""
         self.db_path = db_path
         self.conn = None
         self.cursor = None
-        self._connect()
-        self._create_tables()
+        self._transaction_depth = 0
+        self._channel_cache = OrderedDict()  # channel_id -> row dict (LRU)
+        self._quota_buf = deque()  # pending quota_tracking rows
+        self._quota_last_flush = time.monotonic()
+        self._owner_thread = threading.get_ident()  # sqlite3 connections are bound to it
         
     def _connect(self):
         """Establish database connection"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
-            # Enable foreign keys
-            self.cursor.execute("PRAGMA foreign_keys = ON")
-            logger.info(f"Connected to database: {self.db_path}")
+            # Larger statement cache keeps every insert/upsert statement prepared
+            self.conn = sqlite3.connect(self.db_path, cached_statements=256)
+            self._configure()
         except Exception as e:
             logger.error(f"Error connecting to database: {e}")
             raise
+
+    def _configure(self):
+        """Apply the connection settings for this kind of database"""
+        self.cursor = self.conn.cursor()
+        # Enable foreign keys
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+        if self.db_path == ':memory:':
+            # Autocommit mode; _begin() opens the transactions multi-row writes need
+            self.conn.isolation_level = None
+            # Nothing here outlives the process, so skip syncs and keep temp
+            # structures in RAM (journal_mode stays MEMORY: OFF breaks ROLLBACK)
+            self.cursor.execute("PRAGMA synchronous = OFF")
+            self.cursor.execute("PRAGMA temp_store = MEMORY")
+        else:
+            # WAL: readers don't block the writer and commits skip the
+            # rollback-journal fsyncs (NORMAL is still crash-safe with WAL)
+            self.cursor.execute("PRAGMA journal_mode = WAL")
+            self.cursor.execute("PRAGMA synchronous = NORMAL")
+            self.cursor.execute("PRAGMA temp_store = MEMORY")
+            self.cursor.execute("PRAGMA cache_size = -65536")  # 64 MiB
+            self.cursor.execute("PRAGMA mmap_size = 1073741824")  # 1 GiB
+        logger.info(f"Connected to database: {self.db_path}")
     
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into a single transaction
+
+        Insert methods called inside the block skip their own commit, so the
+        whole block is written with one commit on exit (rolled back on error).
+        Blocks may be nested; only the outermost one commits.
+        """
+        if not self._transaction_depth:
+            self._begin()
+        self._transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._transaction_depth -= 1
+            self._rollback()
+            raise
+        else:
+            self._transaction_depth -= 1
+            if not self._transaction_depth:
+                self.conn.commit()
+
+    @contextmanager
+    def savepoint(self, name: str = 'sp', rollback: bool = False):
+        """
+        Run the block inside a SAVEPOINT, nested in any open transaction
+
+        Like transaction(), insert methods inside skip their own commit. The
+        savepoint is released on exit, or rolled back on error - or always
+        with rollback=True (e.g. to undo everything a test wrote).
+        """
+        self.conn.execute(f"SAVEPOINT {name}")
+        self._transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            rollback = True
+            raise
+        finally:
+            self._transaction_depth -= 1
+            if self.conn.in_transaction:
+                if rollback:
+                    self.conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                    self._channel_cache.clear()
+                self.conn.execute(f"RELEASE SAVEPOINT {name}")
+
+    def _begin(self):
+        """Open a transaction explicitly when the connection is in autocommit mode"""
+        if self.conn.isolation_level is None and not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+
+    def _commit(self):
+        """Commit unless an enclosing transaction() block will do it"""
+        if not self._transaction_depth:
+            self.conn.commit()
+
+    def _rollback(self):
+        """Roll back unless inside transaction(); a failed statement only undoes itself"""
+        if not self._transaction_depth:
+            self.conn.rollback()
+            self._channel_cache.clear()  # May hold rows that were just rolled back
+
+    def flush(self):
+        """Write buffered quota rows and commit any pending writes (unless inside transaction())"""
+        if self.conn:
+            self._flush_quota_buf()
+            self._commit()
+
     def _create_tables(self):
         """Create database tables if they don't exist"""
         try:
@@ -47,7 +298,6 @@ class Database:
             self.cursor.execute("""
                 CREATE TABLE IF NOT EXISTS channels (
                     channel_id TEXT PRIMARY KEY,
-                    channel_url TEXT,
                     channel_title TEXT,
                     description TEXT,
                     custom_url TEXT,
@@ -68,6 +318,24 @@ class Database:
                 )
             """)
             
+            # channel_url is derived from channel_id by the channels_v view
+            # instead of being stored (drop it from existing databases)
+            self.cursor.execute("""
+                PRAGMA table_info(channels)
+            """)
+            columns = [col[1] for col in self.cursor.fetchall()]
+            if 'channel_url' in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+                self.cursor.execute("""
+                    ALTER TABLE channels
+                    DROP COLUMN channel_url
+                """)
+
+            self.cursor.execute("""
+                CREATE VIEW IF NOT EXISTS channels_v AS
+                SELECT *, 'https://www.youtube.com/channel/' || channel_id AS channel_url
+                FROM channels
+            """)
+            
             # Videos table
             self.cursor.execute("""
                 CREATE TABLE IF NOT EXISTS videos (
@@ -159,24 +427,47 @@ class Database:
                     ADD COLUMN quota_cumulative INTEGER DEFAULT 0
                 """)
 
-            # Quota tracking table for detailed API call tracking
+            # Quota tracking table for detailed API call tracking.
+            # Clustered by (run_id, track_id) so per-run queries read contiguous
+            # pages; ts is a unix epoch integer.
+            self.cursor.execute("""
+                PRAGMA table_info(quota_tracking)
+            """)
+            columns = [col[1] for col in self.cursor.fetchall()]
+            if 'timestamp' in columns:
+                # Old rowid layout with ISO timestamps - rebuild it
+                self.cursor.execute("ALTER TABLE quota_tracking RENAME TO quota_tracking_old")
+
             self.cursor.execute("""
                 CREATE TABLE IF NOT EXISTS quota_tracking (
-                    track_id INTEGER PRIMARY KEY AUTOINCREMENT,
                     run_id INTEGER,
-                    timestamp TEXT,
+                    track_id INTEGER,
+                    ts INTEGER,
                     api_method TEXT,
                     quota_cost INTEGER,
                     details TEXT,
+                    PRIMARY KEY (run_id, track_id),
                     FOREIGN KEY (run_id) REFERENCES collection_runs (run_id)
-                )
+                ) WITHOUT ROWID
             """)
+
+            if 'timestamp' in columns:
+                self.cursor.execute("""
+                    INSERT INTO quota_tracking (run_id, track_id, ts, api_method, quota_cost, details)
+                    SELECT run_id, track_id, CAST(strftime('%s', timestamp) AS INTEGER),
+                           api_method, quota_cost, details
+                    FROM quota_tracking_old
+                """)
+                self.cursor.execute("DROP TABLE quota_tracking_old")
             
             # Create indexes for common queries
+            # Covers channel -> video ID lookups and joins on its own; it
+            # supersedes the single-column index older databases have
             self.cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_videos_channel 
-                ON videos(channel_id)
+                CREATE INDEX IF NOT EXISTS idx_videos_channel_covering 
+                ON videos(channel_id, video_id)
             """)
+            self.cursor.execute("DROP INDEX IF EXISTS idx_videos_channel")
             
             self.cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_videos_published 
@@ -193,13 +484,77 @@ class Database:
                 ON comments(published_at)
             """)
             
+            # Sort keys of the top-N listings in view_data.py, so LIMIT stops
+            # an index scan early instead of sorting the whole table
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_channels_subscribers 
+                ON channels(subscriber_count)
+            """)
+            
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_videos_views 
+                ON videos(view_count)
+            """)
+            
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_comments_likes 
+                ON comments(like_count)
+            """)
+            
+            # Distinct commenters are counted in index order, without a
+            # temporary table of every author
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_comments_author 
+                ON comments(author_channel_id)
+            """)
+            
             self.conn.commit()
+
+            # Gather planner statistics once for databases never analyzed;
+            # afterwards PRAGMA optimize (close/maintenance) keeps them fresh
+            self.cursor.execute("""
+                SELECT name FROM sqlite_master
+                WHERE type='table' AND name='sqlite_stat1'
+            """)
+            if not self.cursor.fetchone():
+                self.cursor.execute("ANALYZE")
+                self.conn.commit()
+
             logger.info("Database tables created/verified")
             
         except Exception as e:
             logger.error(f"Error creating tables: {e}")
             raise
     
+    def _channel_row(self, channel_data: Dict, now_iso: str) -> tuple:
+        """Build the channels INSERT parameters for one API channel resource"""
+        snippet = channel_data.get('snippet', {})
+        statistics = channel_data.get('statistics', {})
+        branding = channel_data.get('brandingSettings', {}).get('channel', {})
+        source_metadata = channel_data.get('source_metadata', {})
+        topics = channel_data.get('topicDetails', {}).get('topicCategories')
+        keywords = branding.get('keywords')
+
+        return (
+            channel_data['id'],
+            snippet.get('title'),
+            snippet.get('description'),
+            snippet.get('customUrl'),
+            snippet.get('publishedAt'),
+            snippet.get('country'),
+            int(statistics.get('subscriberCount', 0)) if statistics.get('subscriberCount') else None,
+            int(statistics.get('videoCount', 0)) if statistics.get('videoCount') else None,
+            int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else None,
+            _jdumps(topics) if topics else _EMPTY_JSON,
+            keywords,
+            _jdumps(keywords.split()) if keywords else _EMPTY_JSON,
+            now_iso,  # first_collected_at (kept on update)
+            now_iso,
+            source_metadata.get('domain'),
+            source_metadata.get('rating'),
+            source_metadata.get('orientation')
+        )
+
     def insert_channel(self, channel_data: Dict) -> bool:
         """
         Insert or update channel data
@@ -211,47 +566,52 @@ class Database:
             True if successful, False otherwise
         """
         try:
-            snippet = channel_data.get('snippet', {})
-            statistics = channel_data.get('statistics', {})
-            branding = channel_data.get('brandingSettings', {}).get('channel', {})
-            source_metadata = channel_data.get('source_metadata', {})
-
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO channels (
-                    channel_id, channel_url, channel_title, description, custom_url,
-                    published_at, country, subscriber_count, video_count, view_count,
-                    topic_categories, keywords, branding_keywords, last_updated_at,
-                    source_domain, source_rating, source_orientation
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                channel_data['id'],
-                f"https://www.youtube.com/channel/{channel_data['id']}",
-                snippet.get('title'),
-                snippet.get('description'),
-                snippet.get('customUrl'),
-                snippet.get('publishedAt'),
-                snippet.get('country'),
-                int(statistics.get('subscriberCount', 0)) if statistics.get('subscriberCount') else None,
-                int(statistics.get('videoCount', 0)) if statistics.get('videoCount') else None,
-                int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else None,
-                json.dumps(channel_data.get('topicDetails', {}).get('topicCategories', [])),
-                branding.get('keywords'),
-                json.dumps(branding.get('keywords', '').split() if branding.get('keywords') else []),
-                datetime.utcnow().isoformat(),
-                source_metadata.get('domain'),
-                source_metadata.get('rating'),
-                source_metadata.get('orientation')
-            ))
+            self.cursor.execute(_SQL_INSERT_CHANNEL,
+                                self._channel_row(channel_data, datetime.utcnow().isoformat()))
+            self._channel_cache.pop(channel_data['id'], None)
             
-            self.conn.commit()
+            self._commit()
             logger.debug(f"Inserted/updated channel: {channel_data['id']}")
             return True
             
         except Exception as e:
             logger.error(f"Error inserting channel: {e}")
-            self.conn.rollback()
+            self._rollback()
             return False
     
+    def _video_row(self, video_data: Dict, now_iso: str) -> Dict:
+        """Build the named videos INSERT parameters for one API video resource"""
+        snippet = video_data.get('snippet', {})
+        statistics = video_data.get('statistics', {})
+        content_details = video_data.get('contentDetails', {})
+        status = video_data.get('status', {})
+        tags = snippet.get('tags')
+        topics = video_data.get('topicDetails', {}).get('topicCategories')
+
+        duration_str = content_details.get('duration')
+
+        return {
+            'video_id': video_data['id'],
+            'channel_id': snippet.get('channelId'),
+            'title': snippet.get('title'),
+            'description': snippet.get('description'),
+            'published_at': snippet.get('publishedAt'),
+            'duration': duration_str,
+            'duration_seconds': parse_duration_seconds(duration_str),
+            'category_id': snippet.get('categoryId'),
+            'default_language': snippet.get('defaultLanguage'),
+            'default_audio_language': snippet.get('defaultAudioLanguage'),
+            'view_count': int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else None,
+            'like_count': int(statistics.get('likeCount', 0)) if statistics.get('likeCount') else None,
+            'comment_count': int(statistics.get('commentCount', 0)) if statistics.get('commentCount') else None,
+            'tags': _jdumps(tags) if tags else _EMPTY_JSON,
+            'topic_categories': _jdumps(topics) if topics else _EMPTY_JSON,
+            'made_for_kids': status.get('madeForKids'),
+            'has_captions': content_details.get('caption') == 'true',
+            'thumbnail_url': snippet.get('thumbnails', {}).get('high', {}).get('url'),
+            'collected_at': now_iso
+        }
+
     def insert_video(self, video_data: Dict) -> bool:
         """
         Insert or update video data
@@ -263,60 +623,65 @@ class Database:
             True if successful, False otherwise
         """
         try:
-            snippet = video_data.get('snippet', {})
-            statistics = video_data.get('statistics', {})
-            content_details = video_data.get('contentDetails', {})
-            status = video_data.get('status', {})
-            
-            # Parse duration to seconds
-            duration_seconds = None
-            duration_str = content_details.get('duration')
-            if duration_str:
-                try:
-                    import isodate
-                    duration_seconds = int(isodate.parse_duration(duration_str).total_seconds())
-                except:
-                    pass
-            
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO videos (
-                    video_id, channel_id, title, description, published_at,
-                    duration, duration_seconds, category_id, default_language,
-                    default_audio_language, view_count, like_count, comment_count,
-                    tags, topic_categories, made_for_kids, has_captions,
-                    thumbnail_url, collected_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                video_data['id'],
-                snippet.get('channelId'),
-                snippet.get('title'),
-                snippet.get('description'),
-                snippet.get('publishedAt'),
-                content_details.get('duration'),
-                duration_seconds,
-                snippet.get('categoryId'),
-                snippet.get('defaultLanguage'),
-                snippet.get('defaultAudioLanguage'),
-                int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else None,
-                int(statistics.get('likeCount', 0)) if statistics.get('likeCount') else None,
-                int(statistics.get('commentCount', 0)) if statistics.get('commentCount') else None,
-                json.dumps(snippet.get('tags', [])),
-                json.dumps(video_data.get('topicDetails', {}).get('topicCategories', [])),
-                status.get('madeForKids'),
-                content_details.get('caption') == 'true',
-                snippet.get('thumbnails', {}).get('high', {}).get('url'),
-                datetime.utcnow().isoformat()
-            ))
+            self.cursor.execute(_SQL_INSERT_VIDEO,
+                                self._video_row(video_data, datetime.utcnow().isoformat()))
             
-            self.conn.commit()
+            self._commit()
             logger.debug(f"Inserted/updated video: {video_data['id']}")
             return True
             
         except Exception as e:
             logger.error(f"Error inserting video: {e}")
-            self.conn.rollback()
+            self._rollback()
+            return False
+
+    def insert_videos_batch(self, videos: List[Dict]) -> bool:
+        """
+        Insert or update multiple videos in a single transaction
+
+        Args:
+            videos: List of video dictionaries (API video resources)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not videos:
+            return True
+
+        try:
+            now_iso = datetime.utcnow().isoformat()
+            rows = [self._video_row(video, now_iso) for video in videos]
+            self._begin()
+            self.cursor.executemany(_SQL_INSERT_VIDEO, rows)
+
+            self._commit()
+            logger.debug(f"Inserted/updated {len(rows)} videos")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error in batch video insert: {e}")
+            self._rollback()
             return False
     
+    def _comment_row(self, comment_data: Dict, now_iso: str) -> tuple:
+        """Build the comments INSERT parameters for one comment dict"""
+        # Support both 'author' and 'author_name' field names
+        author = comment_data.get('author_name') or comment_data.get('author', '')
+
+        return (
+            comment_data['comment_id'],
+            comment_data['video_id'],
+            comment_data.get('parent_id'),
+            author,
+            comment_data.get('author_channel_id'),
+            comment_data['text'],
+            comment_data.get('like_count', 0),
+            comment_data.get('reply_count', 0),
+            comment_data.get('published_at'),
+            comment_data.get('updated_at'),
+            now_iso
+        )
+
     def insert_comment(self, comment_data: Dict) -> bool:
         """
         Insert or update comment data
@@ -331,40 +696,25 @@ class Database:
             True if successful, False otherwise
         """
         try:
-            # Support both 'author' and 'author_name' field names
-            author = comment_data.get('author_name') or comment_data.get('author', '')
+            self.cursor.execute(_SQL_INSERT_COMMENT,
+                                self._comment_row(comment_data, datetime.utcnow().isoformat()))
 
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO comments (
-                    comment_id, video_id, parent_id, author_name, author_channel_id,
-                    text, like_count, reply_count, published_at, updated_at, collected_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                comment_data['comment_id'],
-                comment_data['video_id'],
-                comment_data.get('parent_id'),
-                author,
-                comment_data.get('author_channel_id'),
-                comment_data['text'],
-                comment_data.get('like_count', 0),
-                comment_data.get('reply_count', 0),
-                comment_data.get('published_at'),
-                comment_data.get('updated_at'),
-                datetime.utcnow().isoformat()
-            ))
-
-            self.conn.commit()
+            self._commit()
             return True
 
         except Exception as e:
             logger.error(f"Error inserting comment: {e}")
-            self.conn.rollback()
+            self._rollback()
             return False
     
     def insert_comments_batch(self, comments: List[Dict]) -> bool:
         """
         Insert multiple comments in a batch
 
+        All rows go in with one executemany and one commit. If that fails
+        (e.g. a comment for an unknown video), the comments are inserted one
+        by one so the valid ones are still kept.
+
         Args:
             comments: List of comment dictionaries
 
@@ -374,19 +724,23 @@ class Database:
         if not comments:
             return True
 
-        success_count = 0
-
         try:
-            for comment in comments:
-                if self.insert_comment(comment):
-                    success_count += 1
+            now_iso = datetime.utcnow().isoformat()
+            rows = [self._comment_row(comment, now_iso) for comment in comments]
+            self._begin()
+            self.cursor.executemany(_SQL_INSERT_COMMENT, rows)
 
-            logger.info(f"Inserted {success_count}/{len(comments)} comments")
-            return success_count == len(comments)
+            self._commit()
+            logger.info(f"Inserted {len(rows)}/{len(comments)} comments")
+            return True
 
         except Exception as e:
-            logger.error(f"Error in batch comment insert: {e}")
-            return False
+            logger.warning(f"Batch comment insert failed ({e}), inserting one by one")
+            self._rollback()
+
+        success_count = sum(1 for comment in comments if self.insert_comment(comment))
+        logger.info(f"Inserted {success_count}/{len(comments)} comments")
+        return success_count == len(comments)
     
     def insert_caption_track(self, caption_data: Dict, video_id: str) -> bool:
         """
@@ -402,12 +756,7 @@ class Database:
         try:
             snippet = caption_data.get('snippet', {})
             
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO caption_tracks (
-                    caption_id, video_id, language, language_name,
-                    track_kind, is_auto_generated, collected_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+            self.cursor.execute(_SQL_INSERT_CAPTION_TRACK, (
                 caption_data['id'],
                 video_id,
                 snippet.get('language'),
@@ -416,13 +765,13 @@ class Database:
                 snippet.get('audioTrackType') == 'primary',
                 datetime.utcnow().isoformat()
             ))
-            
-            self.conn.commit()
+
+            self._commit()
             return True
             
         except Exception as e:
             logger.error(f"Error inserting caption track: {e}")
-            self.conn.rollback()
+            self._rollback()
             return False
     
     def start_collection_run(self) -> int:
@@ -438,7 +787,7 @@ class Database:
                 VALUES (?, ?)
             """, (datetime.utcnow().isoformat(), 'running'))
             
-            self.conn.commit()
+            self._commit()
             return self.cursor.lastrowid
             
         except Exception as e:
@@ -454,6 +803,8 @@ class Database:
             stats: Dictionary with collection statistics
         """
         try:
+            self._flush_quota_buf()
+
             # Handle both session quota and cumulative quota
             session_quota = stats.get('quota_used', 0)
             cumulative_quota = stats.get('quota_cumulative', session_quota)
@@ -481,14 +832,22 @@ class Database:
                 run_id
             ))
 
-            self.conn.commit()
+            self._commit()
             logger.info(f"Collection run {run_id} completed with quota: {session_quota} (cumulative: {cumulative_quota})")
 
+            if run_id and run_id % _MAINTENANCE_EVERY_N_RUNS == 0:
+                self.maintenance()
+
         except Exception as e:
             logger.error(f"Error ending collection run: {e}")
     
     def get_channel_by_id(self, channel_id: str) -> Optional[Dict]:
-        """Get channel data by ID"""
+        """Get channel data by ID (cached until the channel is re-inserted)"""
+        cached = self._channel_cache.get(channel_id)
+        if cached is not None:
+            self._channel_cache.move_to_end(channel_id)
+            return dict(cached)
+
         try:
             self.cursor.execute("""
                 SELECT * FROM channels WHERE channel_id = ?
@@ -497,7 +856,11 @@ class Database:
             row = self.cursor.fetchone()
             if row:
                 columns = [desc[0] for desc in self.cursor.description]
-                return dict(zip(columns, row))
+                channel = dict(zip(columns, row))
+                self._channel_cache[channel_id] = channel
+                if len(self._channel_cache) > _CHANNEL_CACHE_SIZE:
+                    self._channel_cache.popitem(last=False)
+                return dict(channel)
             return None
             
         except Exception as e:
@@ -555,22 +918,42 @@ class Database:
         """
         Track individual API quota usage
 
+        Rows are buffered and written in batches of up to 128 (or every
+        5 seconds); flush(), end_collection_run() and close() write the rest.
+        Safe to call from worker threads: they only append to the buffer,
+        which is written from the thread that opened the database.
+
         Args:
             run_id: Collection run ID
             api_method: Name of API method called
             quota_cost: Quota units consumed
             details: Optional details about the call
         """
+        self._quota_buf.append((run_id, run_id, int(time.time()), api_method, quota_cost, details))
+        if threading.get_ident() != self._owner_thread:
+            return
+        if (len(self._quota_buf) >= _QUOTA_FLUSH_ROWS
+                or time.monotonic() - self._quota_last_flush > _QUOTA_FLUSH_SECONDS):
+            self._flush_quota_buf()
+
+    def _flush_quota_buf(self):
+        """Write buffered quota_tracking rows in one executemany"""
+        self._quota_last_flush = time.monotonic()
+        if not self._quota_buf:
+            return
+
+        # popleft() so rows appended by worker threads meanwhile are kept
+        rows = [self._quota_buf.popleft() for _ in range(len(self._quota_buf))]
         try:
-            self.cursor.execute("""
-                INSERT INTO quota_tracking (run_id, timestamp, api_method, quota_cost, details)
-                VALUES (?, ?, ?, ?, ?)
-            """, (run_id, datetime.utcnow().isoformat(), api_method, quota_cost, details))
-
-            self.conn.commit()
+            self._begin()
+            self.cursor.executemany(_SQL_INSERT_QUOTA, rows)
+            self._commit()
 
         except Exception as e:
             logger.error(f"Error tracking quota usage: {e}")
+            # Keep the rows for the next flush
+            self._rollback()
+            self._quota_buf.extendleft(reversed(rows))
 
     def get_last_quota_cumulative(self) -> int:
         """
@@ -612,14 +995,29 @@ class Database:
                 SET quota_used = ?, quota_cumulative = ?
                 WHERE run_id = ?
             """, (session_quota, cumulative_quota, run_id))
-
-            self.conn.commit()
+            self._commit()
 
         except Exception as e:
             logger.error(f"Error updating run quota: {e}")
 
+    def maintenance(self):
+        """Checkpoint the WAL (if any) and refresh planner statistics"""
+        try:
+            self.flush()
+            self.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.cursor.execute("PRAGMA optimize")
+            logger.info("Database maintenance completed")
+
+        except Exception as e:
+            logger.error(f"Error running database maintenance: {e}")
+
     def close(self):
         """Close database connection"""
         if self.conn:
+            self.flush()
+            try:
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.warning(f"PRAGMA optimize failed: {e}")
             self.conn.close()
             logger.info("Database connection closed")
\ No newline at end of file
@@ -3,65 +3,154 @@ Utilities for YouTube Monitoring Pipeline
 """
 
 import csv
+import importlib.util
+import json
 import logging
+import os
+from bisect import bisect_right
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
 import re
 
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# The sources cache needs a Parquet engine; without one it is neither read
+# nor written (rather than failing on every run)
+_HAVE_PARQUET = any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet'))
+
 logger = logging.getLogger(__name__)
 
+# First path segments that are followed by the channel ID or name
+# (youtube.com/channel/ID, /c/NAME, /user/NAME)
+_CHANNEL_PATH_KINDS = frozenset(('channel', 'c', 'user'))
+
+# ISO 8601 durations as returned by the API, e.g. PT1H2M3S or P1DT3M
+_DUR_RE = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+
+# Video length category boundaries in seconds (1, 5, 20 and 60 min), and the
+# label for each bucket; the arrays are the same tables for the vectorized version
+_BOUNDS = (60, 300, 1200, 3600)
+_LABELS = ('very_short', 'short', 'medium', 'long', 'very_long')
+_LENGTH_BINS = np.array(_BOUNDS)
+_LENGTH_LABELS = np.array(_LABELS)
+
+# format_duration() output for everything under an hour ("M:SS"), by seconds
+_SHORT = [f"{s // 60}:{s % 60:02d}" for s in range(3600)]
+
+# Source CSV columns and the keys they are exposed under
+_SOURCE_COLUMNS = {
+    'Youtube': 'youtube_url',
+    'Domain': 'domain',
+    'Brand Name': 'brand_name',
+    'Country': 'country',
+    'Language': 'language',
+    'Rating': 'rating',
+    'Score': 'score',
+    'Orientation': 'orientation',
+    'Type of Content': 'type_of_content',
+    'Topics': 'topics',
+    'Owner': 'owner',
+    'Type of Owner': 'type_of_owner',
+}
+
+
+def _read_sources_cache(cache_path: str, csv_path: str) -> Optional[List[Dict]]:
+    """Load sources from the Parquet cache if it is newer than the CSV"""
+    try:
+        if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(csv_path):
+            return None
+        
+        return pd.read_parquet(cache_path).to_dict('records')
+        
+    except Exception as e:  # unreadable cache
+        logger.debug(f"Not using sources cache {cache_path}: {e}")
+        return None
+
+
+def _write_sources_cache(sources: List[Dict], cache_path: str):
+    """Save parsed sources as Parquet so later runs can skip the CSV parse"""
+    try:
+        pd.DataFrame(sources).to_parquet(cache_path, compression='snappy')
+        
+    except Exception as e:
+        logger.debug(f"Could not write sources cache {cache_path}: {e}")
+
 
 def load_sources_from_csv(csv_path: str) -> List[Dict]:
     """
     Load YouTube channel sources from CSV file
     
+    The parsed sources are cached next to the CSV as ``<csv_path>.parquet``
+    (when pyarrow or fastparquet is installed) and reused until the CSV
+    changes.
+    
     Args:
         csv_path: Path to CSV file with source data
         
     Returns:
         List of source dictionaries with metadata
     """
-    sources = []
+    cache_path = f"{csv_path}.parquet"
+    if _HAVE_PARQUET:
+        sources = _read_sources_cache(cache_path, csv_path)
+        if sources is not None:
+            logger.info(f"Loaded {len(sources)} YouTube channels from cache {cache_path}")
+            return sources
     
     try:
-        df = pd.read_csv(csv_path, encoding='utf-8')
+        sources = list(iter_sources_from_csv(csv_path))
+        logger.info(f"Extracted {len(sources)} YouTube channels from CSV")
         
-        logger.info(f"Loaded CSV with {len(df)} rows")
+        if sources and _HAVE_PARQUET:
+            _write_sources_cache(sources, cache_path)
+        return sources
         
-        for idx, row in df.iterrows():
-            youtube_url = row.get('Youtube', '')
+    except Exception as e:
+        logger.error(f"Error loading sources from CSV: {e}")
+        return []
+
+
+def iter_sources_from_csv(csv_path: str) -> Iterator[Dict]:
+    """
+    Lazily yield YouTube channel sources from CSV file
+    
+    Rows are parsed only as they are consumed, so callers that need just the
+    first few sources (e.g. with itertools.islice) do not read the whole file.
+    Unlike load_sources_from_csv, errors are raised and no cache is used.
+    
+    Args:
+        csv_path: Path to CSV file with source data
+        
+    Yields:
+        Source dictionaries with metadata, one per YouTube URL
+    """
+    row_count = 0
+    
+    # utf-8-sig so a byte-order mark does not end up in the first header
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f, restval=''):
+            row_count += 1
+            youtube_url = row.get('Youtube') or ''
             
             # Skip if no YouTube URL
-            if pd.isna(youtube_url) or youtube_url.strip() == '':
+            if not youtube_url.strip():
                 continue
             
-            # Handle multiple URLs (some rows have comma-separated URLs)
-            urls = [url.strip() for url in str(youtube_url).split(',')]
+            # Missing columns become ''
+            metadata = {key: row.get(col) or '' for col, key in _SOURCE_COLUMNS.items()}
             
-            for url in urls:
-                if url and url.strip() != '':
-                    source = {
-                        'youtube_url': url.strip(),
-                        'domain': row.get('Domain', ''),
-                        'brand_name': row.get('Brand Name', ''),
-                        'country': row.get('Country', ''),
-                        'language': row.get('Language', ''),
-                        'rating': row.get('Rating', ''),
-                        'score': row.get('Score', ''),
-                        'orientation': row.get('Orientation', ''),
-                        'type_of_content': row.get('Type of Content', ''),
-                        'topics': row.get('Topics', ''),
-                        'owner': row.get('Owner', ''),
-                        'type_of_owner': row.get('Type of Owner', ''),
-                    }
-                    sources.append(source)
-        
-        logger.info(f"Extracted {len(sources)} YouTube channels from CSV")
-        return sources
-        
-    except Exception as e:
-        logger.error(f"Error loading sources from CSV: {e}")
-        return []
+            # Handle multiple URLs (some rows have comma-separated URLs)
+            for url in youtube_url.split(','):
+                url = url.strip()
+                if url:
+                    yield {**metadata, 'youtube_url': url}
+    
+    logger.info(f"Loaded CSV with {row_count} rows")
 
 
 def extract_channel_id_from_url(url: str) -> Optional[str]:
@@ -79,35 +168,45 @@ def extract_channel_id_from_url(url: str) -> Optional[str]:
     
     url = url.strip()
     
-    # Remove query parameters
-    url = url.split('?')[0]
-    
-    # Handle youtube.com/channel/ID format
-    if '/channel/' in url:
-        return url.split('/channel/')[-1].split('/')[0]
-    
-    # Handle youtube.com/@handle format
-    if '/@' in url:
-        return '@' + url.split('/@')[-1].split('/')[0]
-    
-    # Handle youtube.com/c/NAME format
-    if '/c/' in url:
-        return url.split('/c/')[-1].split('/')[0]
-    
-    # Handle youtube.com/user/NAME format
-    if '/user/' in url:
-        return url.split('/user/')[-1].split('/')[0]
-    
-    # Handle direct channel name
-    if 'youtube.com/' in url:
-        parts = url.split('youtube.com/')[-1].split('/')
-        if parts and parts[0]:
-            return parts[0]
+    # urlparse only finds the host when the URL has a scheme
+    parsed = urlparse(url if '://' in url else f'https://{url}')
+    host = parsed.hostname or ''
+    if host == 'youtube.com' or host.endswith('.youtube.com'):
+        # Query string and fragment are already split off
+        parts = parsed.path.strip('/').split('/', 2)
+        first = parts[0]
+        if first.startswith('@'):
+            return first
+        # /channel/ID, /c/NAME and /user/NAME, or a direct channel name
+        if first in _CHANNEL_PATH_KINDS:
+            if len(parts) > 1 and parts[1]:
+                return parts[1]
+        elif first:
+            return first
     
     logger.warning(f"Could not extract channel ID from URL: {url}")
     return None
 
 
+def parse_duration_seconds(duration: str) -> Optional[int]:
+    """
+    Parse an ISO 8601 video duration to seconds
+    
+    Args:
+        duration: Duration string from the API (e.g., "PT2M34S")
+        
+    Returns:
+        Duration in seconds, or None if the string is not a duration
+    """
+    m = _DUR_RE.fullmatch(duration) if duration else None
+    if not m:
+        return None
+    
+    days, hours, minutes, secs = m.groups()
+    return (86400 * int(days or 0) + 3600 * int(hours or 0)
+            + 60 * int(minutes or 0) + int(secs or 0))
+
+
 def format_duration(seconds: int) -> str:
     """
     Format duration in seconds to human-readable string
@@ -118,14 +217,11 @@ def format_duration(seconds: int) -> str:
     Returns:
         Formatted duration string (e.g., "2:34:15")
     """
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
-    
-    if hours > 0:
-        return f"{hours}:{minutes:02d}:{secs:02d}"
-    else:
-        return f"{minutes}:{secs:02d}"
+    if 0 <= seconds < 3600:
+        return _SHORT[seconds]
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
 
 
 def clean_text(text: str) -> str:
@@ -138,16 +234,21 @@ def clean_text(text: str) -> str:
     Returns:
         Cleaned text
     """
-    if not text:
-        return ""
-    
-    # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Strip leading/trailing whitespace
-    text = text.strip()
+    # Collapse runs of whitespace and strip the ends
+    return ' '.join(text.split()) if text else ""
+
+
+def clean_texts(texts: pd.Series) -> pd.Series:
+    """
+    Clean many texts at once (same rules as clean_text)
     
-    return text
+    Args:
+        texts: Series of texts; missing values become ""
+        
+    Returns:
+        Series of cleaned texts
+    """
+    return texts.fillna('').astype(str).str.split().str.join(' ')
 
 
 def calculate_engagement_rate(video_data: Dict) -> float:
@@ -161,21 +262,41 @@ def calculate_engagement_rate(video_data: Dict) -> float:
         Engagement rate (0-1)
     """
     try:
-        views = int(video_data.get('view_count', 0))
-        likes = int(video_data.get('like_count', 0))
-        comments = int(video_data.get('comment_count', 0))
-        
-        if views == 0:
+        # Missing and None counts are 0; views are checked before the others are read
+        views = int(video_data.get('view_count') or 0)
+        if not views:
             return 0.0
-        
-        engagement = (likes + comments) / views
-        return engagement
-        
+        likes = video_data.get('like_count') or 0
+        comments = video_data.get('comment_count') or 0
+        return (int(likes) + int(comments)) / views
+
     except Exception as e:
         logger.error(f"Error calculating engagement rate: {e}")
         return 0.0
 
 
+def _count_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Numeric view of a count column; missing or non-numeric values count as 0"""
+    if column not in df:
+        return pd.Series(0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+
+def calculate_engagement_rates(df: pd.DataFrame) -> pd.Series:
+    """
+    Calculate engagement rates for many videos at once
+    
+    Args:
+        df: DataFrame with view_count, like_count and comment_count columns
+        
+    Returns:
+        Series of engagement rates (0 where a video has no views)
+    """
+    views = _count_column(df, 'view_count')
+    engaged = _count_column(df, 'like_count') + _count_column(df, 'comment_count')
+    return (engaged / views.where(views != 0)).fillna(0.0)
+
+
 def categorize_video_length(duration_seconds: int) -> str:
     """
     Categorize video by length
@@ -186,16 +307,20 @@ def categorize_video_length(duration_seconds: int) -> str:
     Returns:
         Category string
     """
-    if duration_seconds < 60:
-        return 'very_short'  # < 1 min
-    elif duration_seconds < 300:
-        return 'short'  # 1-5 min
-    elif duration_seconds < 1200:
-        return 'medium'  # 5-20 min
-    elif duration_seconds < 3600:
-        return 'long'  # 20-60 min
-    else:
-        return 'very_long'  # > 1 hour
+    return _LABELS[bisect_right(_BOUNDS, duration_seconds)]
+
+
+def categorize_video_lengths(durations) -> np.ndarray:
+    """
+    Categorize many videos by length at once
+    
+    Args:
+        durations: Array-like of video durations in seconds
+        
+    Returns:
+        Array of category strings (same categories as categorize_video_length)
+    """
+    return _LENGTH_LABELS[np.searchsorted(_LENGTH_BINS, durations, side='right')]
 
 
 def setup_logging(log_level: str = 'INFO', log_file: Optional[str] = None):
@@ -242,10 +367,12 @@ def save_json(data: Dict, output_path: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        import json
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
         
         logger.info(f"Saved JSON to {output_path}")
         return True
@@ -266,10 +393,12 @@ def load_json(input_path: str) -> Optional[Dict]:
         Loaded data or None if error
     """
     try:
-        import json
-        
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(input_path, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         
         logger.info(f"Loaded JSON from {input_path}")
         return data
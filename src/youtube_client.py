@@ -3,15 +3,102 @@ YouTube API Client Wrapper
 Handles all interactions with the YouTube Data API v3
 """
 
+import re
 import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Optional, Any
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import isodate
+
+from src.utils.helpers import extract_channel_id_from_url
 
 logger = logging.getLogger(__name__)
 
+# Canonical channel ID: "UC" followed by 22 URL-safe base64 characters
+_UCID_RE = re.compile(r'^UC[0-9A-Za-z_-]{22}$')
+
+# Maximum number of resolved channels (including misses) kept per client
+_CHANNEL_CACHE_SIZE = 4096
+
+
+def _build_youtube(api_key: str):
+    """
+    Build a YouTube Data API service object
+
+    Uses the discovery document bundled with google-api-python-client
+    instead of fetching it, and skips the on-disk discovery cache.
+    """
+    return build('youtube', 'v3', developerKey=api_key,
+                 cache_discovery=False, static_discovery=True)
+
+
+@lru_cache(maxsize=4)
+def _shared_youtube(api_key: str, thread_id: int):
+    """
+    Service object shared by the clients created on one thread
+
+    Keyed by thread as well, since a service object must not be used from
+    two threads at once.
+    """
+    return _build_youtube(api_key)
+
+
+def _build_comment(item: Dict, video_id: str) -> Dict:
+    """Comment dict for the top-level comment of a commentThreads item"""
+    top = item['snippet']['topLevelComment']
+    sn = top['snippet']
+    return {
+        'comment_id': top['id'],
+        'video_id': video_id,
+        'text': sn['textDisplay'],
+        'author': sn['authorDisplayName'],
+        'author_channel_id': sn.get('authorChannelId', {}).get('value'),
+        'like_count': sn['likeCount'],
+        'published_at': sn['publishedAt'],
+        'updated_at': sn['updatedAt'],
+        'parent_id': None,
+        'reply_count': item['snippet']['totalReplyCount']
+    }
+
+
+def _build_reply(reply: Dict, parent_id: str, video_id: str) -> Dict:
+    """Comment dict for one reply in a commentThreads item"""
+    sn = reply['snippet']
+    return {
+        'comment_id': reply['id'],
+        'video_id': video_id,
+        'text': sn['textDisplay'],
+        'author': sn['authorDisplayName'],
+        'author_channel_id': sn.get('authorChannelId', {}).get('value'),
+        'like_count': sn['likeCount'],
+        'published_at': sn['publishedAt'],
+        'updated_at': sn['updatedAt'],
+        'parent_id': parent_id,
+        'reply_count': 0
+    }
+
+
+def comments_from_threads(items: List[Dict], video_id: str) -> List[Dict]:
+    """
+    Flatten a page of commentThreads items into comment dictionaries
+    
+    Args:
+        items: 'items' of a commentThreads.list response
+        video_id: YouTube video ID the threads belong to
+        
+    Returns:
+        Top-level comments followed by their replies
+    """
+    return [_build_comment(item, video_id) for item in items] + [
+        _build_reply(reply, item['snippet']['topLevelComment']['id'], video_id)
+        for item in items if 'replies' in item
+        for reply in item['replies']['comments']
+    ]
+
 
 class YouTubeAPIClient:
     """Wrapper for YouTube Data API v3"""
@@ -32,20 +119,56 @@ class YouTubeAPIClient:
         self.api_key = api_key
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self._owner_thread = threading.get_ident()
+        self._youtube = _shared_youtube(api_key, self._owner_thread)
+        self._local = threading.local()  # Per-thread service objects for worker threads
+        self._lock = threading.Lock()  # Guards quota counters and the channel cache
         self.quota_usage = 0  # Session quota
         self.quota_cumulative = initial_quota  # Cumulative quota
         self.db = db
         self.run_id = run_id
+        self._channel_cache = OrderedDict()  # ID/username/handle -> channel info or None
 
         logger.info(f"YouTube API client initialized with cumulative quota: {initial_quota}")
     
-    def _make_request(self, request_func, quota_cost: int = 1, api_method: str = None) -> Any:
+    @property
+    def youtube(self):
+        """
+        YouTube service object for the calling thread
+
+        httplib2 connections are not thread-safe, so worker threads each
+        build their own service.
+        """
+        if threading.get_ident() == self._owner_thread:
+            return self._youtube
+        service = getattr(self._local, 'youtube', None)
+        if service is None:
+            service = self._local.youtube = _build_youtube(self.api_key)
+        return service
+    
+    def _cached_channel(self, key: str):
+        """Return (hit, channel info) for a previous channel lookup"""
+        with self._lock:
+            if key in self._channel_cache:
+                self._channel_cache.move_to_end(key)
+                return True, self._channel_cache[key]
+        return False, None
+    
+    def _cache_channel(self, key: str, channel: Optional[Dict]) -> Optional[Dict]:
+        """Remember a channel lookup result (None for not found) and return it"""
+        with self._lock:
+            self._channel_cache[key] = channel
+            self._channel_cache.move_to_end(key)
+            if len(self._channel_cache) > _CHANNEL_CACHE_SIZE:
+                self._channel_cache.popitem(last=False)
+        return channel
+    
+    def _make_request(self, request, quota_cost: int = 1, api_method: str = None) -> Any:
         """
         Make API request with retry logic
 
         Args:
-            request_func: Function that executes the API request
+            request: API request object (executed with request.execute())
             quota_cost: Estimated quota cost of this request
             api_method: Name of API method for tracking
 
@@ -54,15 +177,18 @@ class YouTubeAPIClient:
         """
         for attempt in range(self.max_retries):
             try:
-                response = request_func()
-                self.quota_usage += quota_cost
-                self.quota_cumulative += quota_cost
+                response = request.execute()
+                with self._lock:
+                    self.quota_usage += quota_cost
+                    self.quota_cumulative += quota_cost
 
-                # Track quota in database if available
+                # Track quota in database if available (only buffered when
+                # called from a worker thread, so it needs no lock here)
                 if self.db and self.run_id and api_method:
                     self.db.track_quota_usage(self.run_id, api_method, quota_cost)
 
-                logger.debug(f"API request successful. Session quota: {self.quota_usage}, Cumulative: {self.quota_cumulative}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"API request successful. Session quota: {self.quota_usage}, Cumulative: {self.quota_cumulative}")
                 return response
             except HttpError as e:
                 if e.resp.status in [403, 429]:  # Quota exceeded or rate limit
@@ -90,82 +216,94 @@ class YouTubeAPIClient:
         Returns:
             Channel ID or handle
         """
-        if not url or url.strip() == "":
-            return None
-        
-        url = url.strip()
-        
-        # Handle youtube.com/channel/ID format
-        if '/channel/' in url:
-            return url.split('/channel/')[-1].split('/')[0].split('?')[0]
-        
-        # Handle youtube.com/c/NAME or youtube.com/@handle format
-        if '/c/' in url or '/@' in url:
-            # Return the custom name/handle - we'll need to resolve it
-            if '/c/' in url:
-                return url.split('/c/')[-1].split('/')[0].split('?')[0]
-            else:
-                return '@' + url.split('/@')[-1].split('/')[0].split('?')[0]
-        
-        # Handle youtube.com/user/NAME format
-        if '/user/' in url:
-            return url.split('/user/')[-1].split('/')[0].split('?')[0]
-        
-        logger.warning(f"Could not extract channel ID from URL: {url}")
-        return None
+        return extract_channel_id_from_url(url)
     
     def get_channel_by_username(self, username: str) -> Optional[Dict]:
         """
         Get channel information by username or custom URL
         
         Args:
-            username: Channel username or handle
+            username: Channel username (handles starting with @ are looked up
+                with get_channel_by_handle)
             
         Returns:
             Channel information
         """
+        if username.startswith('@'):
+            return self.get_channel_by_handle(username)
+        
+        hit, channel = self._cached_channel(username)
+        if hit:
+            return channel
+        
         try:
-            # Try forUsername first
             request = self.youtube.channels().list(
                 part='snippet,statistics,contentDetails',
                 forUsername=username
             )
-            response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='channels.list_forUsername')
+            response = self._make_request(request, quota_cost=1, api_method='channels.list_forUsername')
             
             if response and response.get('items'):
-                return response['items'][0]
+                return self._cache_channel(username, response['items'][0])
             
-            # Try forHandle if username starts with @
-            if username.startswith('@'):
-                request = self.youtube.channels().list(
-                    part='snippet,statistics,contentDetails',
-                    forHandle=username
-                )
-                response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='channels.list_forHandle')
-                
-                if response and response.get('items'):
-                    return response['items'][0]
+            return self._cache_channel(username, self._search_channel(username))
             
-            # Try search as last resort
-            request = self.youtube.search().list(
-                part='snippet',
-                q=username,
-                type='channel',
-                maxResults=1
+        except Exception as e:
+            logger.error(f"Error getting channel by username {username}: {e}")
+            return None
+    
+    def get_channel_by_handle(self, handle: str) -> Optional[Dict]:
+        """
+        Get channel information by handle, in a single channels.list call
+        
+        Args:
+            handle: Channel handle, with or without the leading @
+            
+        Returns:
+            Channel information
+        """
+        handle = handle if handle.startswith('@') else f'@{handle}'
+        hit, channel = self._cached_channel(handle)
+        if hit:
+            return channel
+        
+        try:
+            request = self.youtube.channels().list(
+                part='snippet,statistics,contentDetails',
+                forHandle=handle
             )
-            response = self._make_request(lambda: request.execute(), quota_cost=100, api_method='search.list')
+            response = self._make_request(request, quota_cost=1, api_method='channels.list_forHandle')
             
             if response and response.get('items'):
-                channel_id = response['items'][0]['id']['channelId']
-                return self.get_channel_info(channel_id)
+                return self._cache_channel(handle, response['items'][0])
             
-            logger.warning(f"Could not find channel for username: {username}")
-            return None
+            return self._cache_channel(handle, self._search_channel(handle))
             
         except Exception as e:
-            logger.error(f"Error getting channel by username {username}: {e}")
+            logger.error(f"Error getting channel by handle {handle}: {e}")
             return None
     
+    def _search_channel(self, query: str) -> Optional[Dict]:
+        """
+        Find a channel with search.list (last resort: costs 100 units)
+        
+        The caller caches the result, misses included, so the search is not
+        repeated.
+        """
+        request = self.youtube.search().list(
+            part='snippet',
+            q=query,
+            type='channel',
+            maxResults=1
+        )
+        response = self._make_request(request, quota_cost=100, api_method='search.list')
+        
+        if response and response.get('items'):
+            return self.get_channel_info(response['items'][0]['id']['channelId'])
+        
+        logger.warning(f"Could not find channel for: {query}")
+        return None
+    
     def get_channel_info(self, channel_id: str) -> Optional[Dict]:
         """
         Get channel information
@@ -176,27 +314,74 @@ class YouTubeAPIClient:
         Returns:
             Channel information dictionary
         """
+        hit, channel = self._cached_channel(channel_id)
+        if hit:
+            return channel
+        
         try:
-            # If channel_id looks like a custom URL or username, resolve it first
-            if not channel_id.startswith('UC') or len(channel_id) != 24:
+            # Handles and usernames are looked up directly (forHandle/forUsername)
+            if channel_id.startswith('@'):
+                return self.get_channel_by_handle(channel_id)
+            if not _UCID_RE.match(channel_id):
                 return self.get_channel_by_username(channel_id)
             
             request = self.youtube.channels().list(
                 part='snippet,statistics,contentDetails,brandingSettings',
                 id=channel_id
             )
-            response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='channels.list')
+            response = self._make_request(request, quota_cost=1, api_method='channels.list')
             
             if response and response.get('items'):
-                return response['items'][0]
+                return self._cache_channel(channel_id, response['items'][0])
             
             logger.warning(f"No channel found for ID: {channel_id}")
-            return None
+            return self._cache_channel(channel_id, None)
             
         except Exception as e:
             logger.error(f"Error getting channel info for {channel_id}: {e}")
             return None
     
+    def get_channels_info(self, channel_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Get channel information for many channels (batch request)
+        
+        Args:
+            channel_ids: List of YouTube channel IDs (up to 50 per request);
+                anything that is not a UC... channel ID is skipped
+            
+        Returns:
+            Dictionary mapping channel ID to channel information
+        """
+        channels = {}
+        # Drop duplicates (keeping order) and handles/usernames
+        channel_ids = [cid for cid in dict.fromkeys(channel_ids) if cid and _UCID_RE.match(cid)]
+        
+        try:
+            # Process in batches of 50
+            for i in range(0, len(channel_ids), 50):
+                batch = channel_ids[i:i+50]
+                
+                request = self.youtube.channels().list(
+                    part='snippet,statistics,contentDetails,brandingSettings',
+                    id=','.join(batch)
+                )
+                response = self._make_request(request, quota_cost=1, api_method='channels.list')
+                
+                if response:
+                    for item in response.get('items', []):
+                        channels[item['id']] = self._cache_channel(item['id'], item)
+                    # IDs the API did not return do not exist (or are private)
+                    for channel_id in batch:
+                        if channel_id not in channels:
+                            self._cache_channel(channel_id, None)
+            
+            logger.info(f"Retrieved info for {len(channels)} of {len(channel_ids)} channels")
+            return channels
+            
+        except Exception as e:
+            logger.error(f"Error getting channel info batch: {e}")
+            return channels
+    
     def get_channel_videos(self, channel_id: str, max_results: int = 50, 
                           order: str = 'date', published_after: str = None,
                           published_before: str = None) -> List[Dict]:
@@ -236,7 +421,7 @@ class YouTubeAPIClient:
                     request_params['pageToken'] = next_page_token
                 
                 request = self.youtube.playlistItems().list(**request_params)
-                response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='playlistItems.list')
+                response = self._make_request(request, quota_cost=1, api_method='playlistItems.list')
                 
                 if not response:
                     break
@@ -271,6 +456,39 @@ class YouTubeAPIClient:
             logger.error(f"Error getting videos for channel {channel_id}: {e}")
             return videos
     
+    def get_channel_videos_many(self, channel_ids: List[str], max_results: int = 50,
+                                order: str = 'date', published_after: str = None,
+                                published_before: str = None,
+                                max_workers: int = 8) -> Dict[str, List[Dict]]:
+        """
+        Get videos from several channels concurrently
+        
+        Requests are network-bound, so channels are fetched in a thread pool.
+        
+        Args:
+            channel_ids: YouTube channel IDs
+            max_results: Maximum number of videos to retrieve per channel
+            order: Sort order (date, rating, relevance, title, videoCount, viewCount)
+            published_after: RFC 3339 formatted date-time value (e.g., 2024-01-01T00:00:00Z)
+            published_before: RFC 3339 formatted date-time value
+            max_workers: Maximum number of channels fetched at once
+            
+        Returns:
+            Dictionary mapping channel ID to its list of video dictionaries
+        """
+        channel_ids = list(dict.fromkeys(channel_ids))
+        if not channel_ids:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(channel_ids))) as pool:
+            futures = {
+                channel_id: pool.submit(self.get_channel_videos, channel_id, max_results,
+                                        order, published_after, published_before)
+                for channel_id in channel_ids
+            }
+            # get_channel_videos never raises; it returns what it collected
+            return {channel_id: future.result() for channel_id, future in futures.items()}
+    
     def get_video_details(self, video_ids: List[str]) -> List[Dict]:
         """
         Get detailed information for videos (batch request)
@@ -292,7 +510,7 @@ class YouTubeAPIClient:
                     part='snippet,statistics,contentDetails,topicDetails,status',
                     id=','.join(batch)
                 )
-                response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='videos.list')
+                response = self._make_request(request, quota_cost=1, api_method='videos.list')
                 
                 if response:
                     all_videos.extend(response.get('items', []))
@@ -336,45 +554,12 @@ class YouTubeAPIClient:
                 
                 try:
                     request = self.youtube.commentThreads().list(**request_params)
-                    response = self._make_request(lambda: request.execute(), quota_cost=1, api_method='commentThreads.list')
+                    response = self._make_request(request, quota_cost=1, api_method='commentThreads.list')
                     
                     if not response:
                         break
                     
-                    for item in response.get('items', []):
-                        # Top-level comment
-                        top_comment = item['snippet']['topLevelComment']['snippet']
-                        comment_data = {
-                            'comment_id': item['snippet']['topLevelComment']['id'],
-                            'video_id': video_id,
-                            'text': top_comment['textDisplay'],
-                            'author': top_comment['authorDisplayName'],
-                            'author_channel_id': top_comment.get('authorChannelId', {}).get('value'),
-                            'like_count': top_comment['likeCount'],
-                            'published_at': top_comment['publishedAt'],
-                            'updated_at': top_comment['updatedAt'],
-                            'parent_id': None,
-                            'reply_count': item['snippet']['totalReplyCount']
-                        }
-                        comments.append(comment_data)
-                        
-                        # Add replies if present
-                        if 'replies' in item:
-                            for reply in item['replies']['comments']:
-                                reply_snippet = reply['snippet']
-                                reply_data = {
-                                    'comment_id': reply['id'],
-                                    'video_id': video_id,
-                                    'text': reply_snippet['textDisplay'],
-                                    'author': reply_snippet['authorDisplayName'],
-                                    'author_channel_id': reply_snippet.get('authorChannelId', {}).get('value'),
-                                    'like_count': reply_snippet['likeCount'],
-                                    'published_at': reply_snippet['publishedAt'],
-                                    'updated_at': reply_snippet['updatedAt'],
-                                    'parent_id': comment_data['comment_id'],
-                                    'reply_count': 0
-                                }
-                                comments.append(reply_data)
+                    comments.extend(comments_from_threads(response.get('items', []), video_id))
                     
                     next_page_token = response.get('nextPageToken')
                     if not next_page_token:
@@ -413,7 +598,7 @@ class YouTubeAPIClient:
                 part='snippet',
                 videoId=video_id
             )
-            response = self._make_request(lambda: request.execute(), quota_cost=50, api_method='captions.list')
+            response = self._make_request(request, quota_cost=50, api_method='captions.list')
             
             if response:
                 captions = response.get('items', [])
@@ -434,14 +619,27 @@ class YouTubeAPIClient:
     
     def get_quota_usage(self) -> int:
         """Get current session quota usage"""
-        return self.quota_usage
+        with self._lock:
+            return self.quota_usage
 
     def get_quota_cumulative(self) -> int:
         """Get cumulative quota usage across all sessions"""
-        return self.quota_cumulative
+        with self._lock:
+            return self.quota_cumulative
+
+    def flush_quota(self):
+        """
+        Write buffered quota tracking rows to the database
+
+        Database.track_quota_usage batches rows, so call this wherever the
+        stored usage must be up to date (e.g. when checkpointing).
+        """
+        if self.db:
+            self.db.flush()
 
     def reset_quota_counter(self):
         """Reset quota usage counter (call at start of new day)"""
-        self.quota_usage = 0
-        self.quota_cumulative = 0
+        with self._lock:
+            self.quota_usage = 0
+            self.quota_cumulative = 0
         logger.info("Quota counter reset")
\ No newline at end of file
@@ -4,12 +4,20 @@ Test comprehensive collection mode locally before server deployment
 """
 import sys
 import os
+import argparse
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
 
 import yaml
 
+parser = argparse.ArgumentParser(description='Check the comprehensive collection setup and run a 3-channel test')
+parser.add_argument('--yes', action='store_true',
+                   help='Run the test collection without asking')
+parser.add_argument('--dry-run', action='store_true',
+                   help='Skip the API connection check and the test collection (uses no quota)')
+args = parser.parse_args()
+
 print("=" * 80)
 print("Comprehensive Collection Mode - Local Test")
 print("=" * 80)
@@ -38,9 +46,9 @@ except Exception as e:
 # Check source file
 print("2. Checking source file...")
 try:
-    from src.utils.helpers import load_sources_from_csv
-    sources = load_sources_from_csv('data/sources.csv')
-    print(f"   ✓ Found {len(sources)} sources")
+    from src.utils.helpers import iter_sources_from_csv
+    num_sources = sum(1 for _ in iter_sources_from_csv('data/sources.csv'))
+    print(f"   ✓ Found {num_sources} sources")
     print()
 except Exception as e:
     print(f"   ✗ Error loading sources: {e}")
@@ -48,23 +56,27 @@ except Exception as e:
 
 # Test API
 print("3. Testing YouTube API connection...")
-try:
-    from googleapiclient.discovery import build
-    youtube = build('youtube', 'v3', developerKey=api_key)
-    
-    # Simple test search
-    request = youtube.search().list(part='snippet', q='news', type='channel', maxResults=1)
-    response = request.execute()
-    
-    if response.get('items'):
-        print(f"   ✓ API connection successful")
-        print()
-    else:
-        print(f"   ⚠ API returned no results (but connection works)")
-        print()
-except Exception as e:
-    print(f"   ✗ API connection failed: {e}")
-    sys.exit(1)
+if args.dry_run:
+    print("   - Skipped (--dry-run)")
+    print()
+else:
+    try:
+        from googleapiclient.discovery import build
+        youtube = build('youtube', 'v3', developerKey=api_key)
+        
+        # Simple test search
+        request = youtube.search().list(part='snippet', q='news', type='channel', maxResults=1)
+        response = request.execute()
+        
+        if response.get('items'):
+            print(f"   ✓ API connection successful")
+            print()
+        else:
+            print(f"   ⚠ API returned no results (but connection works)")
+            print()
+    except Exception as e:
+        print(f"   ✗ API connection failed: {e}")
+        sys.exit(1)
 
 # Estimate quota usage
 print("4. Comprehensive Collection Estimates")
@@ -97,7 +109,7 @@ print("   ✓ Sources are loaded")
 print()
 print("   Ready to test! Run:")
 print()
-print("   python collect_comprehensive.py \\")
+print("   python collect.py \\")
 print("       --sources data/sources.csv \\")
 print("       --max-channels 3")
 print()
@@ -114,18 +126,26 @@ print("=" * 80)
 print()
 
 # Offer to run test
-response = input("Would you like to run the test now with 3 channels? (y/n): ").strip().lower()
+if args.dry_run:
+    response = 'n'
+elif args.yes:
+    response = 'y'
+else:
+    response = input("Would you like to run the test now with 3 channels? (y/n): ").strip().lower()
 
 if response == 'y':
     print()
     print("Starting comprehensive collection test with 3 channels...")
     print("This will take 10-30 minutes. Press Ctrl+C to stop.")
     print()
-    input("Press Enter to continue...")
+    if not args.yes:
+        input("Press Enter to continue...")
     
-    os.system('python collect_comprehensive.py --sources data/sources.csv --max-channels 3')
+    # Run in this interpreter: everything it imports is already loaded
+    from collect import main as collect_main
+    collect_main(['--sources', 'data/sources.csv', '--max-channels', '3'])
 else:
     print()
     print("Test skipped. Run manually when ready:")
-    print("  python collect_comprehensive.py --sources data/sources.csv --max-channels 3")
+    print("  python collect.py --sources data/sources.csv --max-channels 3")
     print()
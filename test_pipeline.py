@@ -3,22 +3,43 @@ Test script to validate YouTube API setup and perform small test collection
 """
 
 import sys
+import csv
+import asyncio
+import tempfile
+import traceback
 import yaml
+from itertools import islice
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from collect import ComprehensiveCollector
 from src.youtube_client import YouTubeAPIClient
-from src.utils.helpers import setup_logging, load_sources_from_csv
+from src.utils.helpers import setup_logging, load_sources_from_csv, iter_sources_from_csv, save_json, load_json
 
+# Channels resolved on earlier runs (youtube_url -> channel info), reused to
+# skip repeated lookups and save quota
+CHANNEL_CACHE_PATH = Path(__file__).parent / 'tests' / '.cache' / 'channel_resolutions.json'
 
-def test_api_connection(api_key: str) -> bool:
+
+def load_channel_cache(path: Path = CHANNEL_CACHE_PATH) -> dict:
+    """Load cached channel resolutions (empty if there are none yet)"""
+    return (load_json(str(path)) or {}) if path.exists() else {}
+
+
+def save_channel_cache(cache: dict, path: Path = CHANNEL_CACHE_PATH) -> bool:
+    """Save channel resolutions for the next run"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return save_json(cache, str(path))
+
+
+def test_api_connection(client: YouTubeAPIClient) -> bool:
     """
     Test API connection and quota
     
     Args:
-        api_key: YouTube API key
+        client: YouTube API client
         
     Returns:
         True if connection successful
@@ -28,8 +49,6 @@ def test_api_connection(api_key: str) -> bool:
     print("="*60)
     
     try:
-        client = YouTubeAPIClient(api_key)
-        
         # Test with a well-known channel (YouTube Creators)
         test_channel_id = "UCkRfGP3d8Fb6NQJ0oS7TYfg"  # YouTube Creators channel
         
@@ -82,14 +101,29 @@ def test_source_loading(csv_path: str) -> bool:
         return False
 
 
-def test_channel_resolution(api_key: str, sources: list, num_test: int = 3) -> bool:
+async def _resolve_channels(client: YouTubeAPIClient, channel_ids: list) -> list:
+    """
+    Look up channel handles/usernames concurrently
+    
+    The API client is blocking, so each lookup runs in the default thread
+    pool and the event loop only waits on them together.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = [loop.run_in_executor(None, client.get_channel_info, channel_id) for channel_id in channel_ids]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_channel_resolution(client: YouTubeAPIClient, sources: list, num_test: int = 3,
+                            channel_cache: dict = None) -> bool:
     """
     Test resolving channel IDs from URLs
     
     Args:
-        api_key: YouTube API key
+        client: YouTube API client
         sources: List of source dictionaries
         num_test: Number of channels to test
+        channel_cache: Optional youtube_url -> channel info cache; URLs found
+            in it are not looked up again, and new resolutions are added
         
     Returns:
         True if at least one successful
@@ -98,35 +132,54 @@ def test_channel_resolution(api_key: str, sources: list, num_test: int = 3) -> b
     print(f"Testing Channel Resolution ({num_test} channels)")
     print("="*60)
     
+    if channel_cache is None:
+        channel_cache = {}
+    
     try:
-        client = YouTubeAPIClient(api_key)
-        success_count = 0
+        test_sources = sources[:num_test]
+        urls = [source.get('youtube_url', '') for source in test_sources]
+        channel_ids = {url: client.extract_channel_id(url) for url in urls if url not in channel_cache}
         
-        for i, source in enumerate(sources[:num_test], 1):
-            url = source.get('youtube_url', '')
-            brand = source.get('brand_name', 'Unknown')
-            
-            print(f"\n{i}. Testing: {brand}")
+        # Channel IDs are fetched together in one channels.list call; handles
+        # and custom names each need their own lookup, run concurrently
+        resolved = client.get_channels_info(list(channel_ids.values()))
+        pending = [cid for cid in dict.fromkeys(channel_ids.values()) if cid and cid not in resolved]
+        errors = {}
+        for channel_id, result in zip(pending, asyncio.run(_resolve_channels(client, pending))):
+            if isinstance(result, Exception):
+                errors[channel_id] = result
+            elif result:
+                resolved[channel_id] = result
+        
+        for url, channel_id in channel_ids.items():
+            if channel_id in resolved:
+                channel_cache[url] = resolved[channel_id]
+        
+        success_count = 0
+        for i, (source, url) in enumerate(zip(test_sources, urls), 1):
+            print(f"\n{i}. Testing: {source.get('brand_name', 'Unknown')}")
             print(f"   URL: {url}")
             
-            channel_id = client.extract_channel_id(url)
+            channel_info = channel_cache.get(url)
+            channel_id = channel_info['id'] if channel_info else channel_ids.get(url)
             if not channel_id:
                 print(f"   ✗ Could not extract channel ID from URL")
                 continue
             
             print(f"   Channel identifier: {channel_id}")
             
-            channel_info = client.get_channel_info(channel_id)
             if channel_info:
                 print(f"   ✓ Successfully resolved to: {channel_info['snippet']['title']}")
                 print(f"   Subscribers: {channel_info.get('statistics', {}).get('subscriberCount', 'Hidden')}")
                 success_count += 1
+            elif channel_id in errors:
+                print(f"   ✗ Lookup failed: {errors[channel_id]}")
             else:
                 print(f"   ✗ Could not retrieve channel information")
         
         print(f"\n{'='*60}")
         print(f"Successfully resolved {success_count}/{num_test} channels")
-        print(f"Quota used: {client.get_quota_usage()} units")
+        print(f"Quota used so far: {client.get_quota_usage()} units")
         
         return success_count > 0
         
@@ -135,13 +188,15 @@ def test_channel_resolution(api_key: str, sources: list, num_test: int = 3) -> b
         return False
 
 
-def run_mini_collection(api_key: str, sources: list, num_channels: int = 2) -> bool:
+def run_mini_collection(api_key: str, sources: list, work_dir: Path, num_channels: int = 2) -> bool:
     """
     Run a mini collection to test full pipeline
     
     Args:
         api_key: YouTube API key
         sources: List of source dictionaries
+        work_dir: Directory for the temporary config, sources and checkpoints
+            (e.g. a TemporaryDirectory, or pytest's tmp_path)
         num_channels: Number of channels to collect
         
     Returns:
@@ -152,8 +207,6 @@ def run_mini_collection(api_key: str, sources: list, num_channels: int = 2) -> b
     print("="*60)
     
     try:
-        from src.collector import YouTubeCollector
-        
         # Create temporary config
         config = {
             'api': {
@@ -166,15 +219,17 @@ def run_mini_collection(api_key: str, sources: list, num_channels: int = 2) -> b
                 'max_comments_per_video': 10,
                 'video_order': 'date',
                 'comment_order': 'time',
-                'collect_captions': False
+                'collect_captions': False,
+                'parallel_channels': 2
             },
             'database': {
-                'sqlite_path': 'data/test_youtube_monitoring.db'
+                'sqlite_path': ':memory:'  # Throwaway: only the stats printed below matter
             },
             'output': {
                 'save_to_database': True,
                 'save_raw_json': False,
-                'save_to_csv': False
+                'save_to_csv': False,
+                'checkpoint_path': str(work_dir / 'checkpoints')
             },
             'logging': {
                 'level': 'INFO',
@@ -188,45 +243,36 @@ def run_mini_collection(api_key: str, sources: list, num_channels: int = 2) -> b
         }
         
         # Save temporary config
-        import tempfile
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-            yaml.dump(config, f)
-            temp_config_path = f.name
+        config_path = work_dir / 'config.yaml'
+        config_path.write_text(yaml.safe_dump(config))
         
-        # Save temporary sources
-        import pandas as pd
-        temp_sources_df = pd.DataFrame(sources[:num_channels])
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            temp_sources_df.to_csv(f, index=False)
-            temp_sources_path = f.name
+        # Save temporary sources, under the column names the loader reads
+        sources_path = work_dir / 'sources.csv'
+        with open(sources_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Youtube', 'Brand Name'])
+            writer.writerows((source.get('youtube_url', ''), source.get('brand_name', ''))
+                             for source in sources[:num_channels])
         
-        # Run collector
-        collector = YouTubeCollector(config_path=temp_config_path)
-        collector.run_collection(temp_sources_path, max_channels=num_channels)
+        # Run collector (closes its database when done)
+        collector = ComprehensiveCollector(config_path=str(config_path))
+        collector.run(str(sources_path), max_channels=num_channels)
         
         # Print results
         stats = collector.stats
         print("\n" + "="*60)
         print("Mini Collection Results")
         print("="*60)
-        print(f"Channels processed: {stats['channels_processed']}")
+        print(f"Channels processed: {stats['channels_attempted']}")
         print(f"Channels successful: {stats['channels_success']}")
         print(f"Videos collected: {stats['videos_collected']}")
         print(f"Comments collected: {stats['comments_collected']}")
         print(f"Quota used: {stats['quota_used']} units")
         
-        collector.close()
-        
-        # Cleanup temp files
-        import os
-        os.unlink(temp_config_path)
-        os.unlink(temp_sources_path)
-        
         return stats['channels_success'] > 0
         
     except Exception as e:
         print(f"✗ Mini collection failed: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
@@ -256,8 +302,15 @@ def main():
         print("\n✗ Please set your YouTube API key in config/config.yaml")
         return False
     
+    # One client for all API checks
+    try:
+        client = YouTubeAPIClient(api_key)
+    except Exception as e:
+        print(f"\n✗ Could not create YouTube API client: {e}")
+        return False
+    
     # Test 1: API Connection
-    if not test_api_connection(api_key):
+    if not test_api_connection(client):
         print("\n✗ API connection test failed. Please check your API key.")
         return False
     
@@ -271,17 +324,18 @@ def main():
         print("\n✗ Source loading test failed.")
         return False
     
-    # Load sources for remaining tests
-    from src.utils.helpers import load_sources_from_csv
-    sources = load_sources_from_csv(str(sources_path))
+    # Load sources for remaining tests (only the first few are used)
+    sources = list(islice(iter_sources_from_csv(str(sources_path)), 3))
     
     if not sources:
         print("\n✗ No sources available for testing")
         return False
     
     # Test 3: Channel resolution
-    if not test_channel_resolution(api_key, sources, num_test=3):
+    channel_cache = load_channel_cache()
+    if not test_channel_resolution(client, sources, num_test=3, channel_cache=channel_cache):
         print("\n⚠ Warning: Channel resolution had issues, but continuing...")
+    save_channel_cache(channel_cache)
     
     # Test 4: Mini collection
     print("\n" + "="*60)
@@ -292,20 +346,21 @@ def main():
     response = input("Run mini collection? (y/n): ").strip().lower()
     
     if response == 'y':
-        if not run_mini_collection(api_key, sources, num_channels=2):
+        with tempfile.TemporaryDirectory() as work_dir:
+            collected = run_mini_collection(api_key, sources, Path(work_dir), num_channels=2)
+        if not collected:
             print("\n✗ Mini collection test failed.")
             return False
         print("\n✓ Mini collection successful!")
-        print("Check data/test_youtube_monitoring.db for results")
     
     # All tests passed
     print("\n" + "="*60)
     print("✓ All Tests Passed!")
     print("="*60)
     print("\nYou're ready to run the full collection:")
-    print("  python src/collector.py --sources data/sources.csv --max-channels 5")
+    print("  python collect.py --sources data/sources.csv --max-channels 5")
     print("\nOr for full collection:")
-    print("  python src/collector.py --sources data/sources.csv")
+    print("  python collect.py --sources data/sources.csv")
     
     return True
 
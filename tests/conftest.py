@@ -4,48 +4,88 @@ Pytest configuration and shared fixtures
 import pytest
 import tempfile
 import os
+import shutil
 import sys
 from pathlib import Path
 import json
 import sqlite3
+from contextlib import contextmanager
+from functools import lru_cache
+
+import yaml
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.database import Database
-from src.youtube_client import YouTubeAPIClient
+from src.youtube_client import YouTubeAPIClient, _shared_youtube
+
+# libyaml's loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@lru_cache(maxsize=32)
+def _parse_yaml(path_str):
+    """Parse a YAML file once per path; callers must not modify the result."""
+    with open(path_str) as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
 
 
 # ============================================
 # Database Fixtures
 # ============================================
 
-@pytest.fixture
-def in_memory_db():
-    """Provide an in-memory SQLite database for testing."""
+@pytest.fixture(scope='session')
+def _db_schema_template():
+    """Empty in-memory database; its schema is built once and copied per test."""
     db = Database(db_path=":memory:")
     yield db
     db.close()
 
 
+def _clone(template):
+    """New in-memory Database holding a copy of template's schema and rows."""
+    conn = sqlite3.connect(":memory:", cached_statements=256)
+    template.conn.backup(conn)
+    return Database.from_connection(conn)
+
+
 @pytest.fixture
-def temp_db_file():
-    """Provide a temporary database file that is cleaned up after test."""
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
-        db_path = f.name
+def in_memory_db(_db_schema_template):
+    """Provide an in-memory SQLite database for testing."""
+    db = _clone(_db_schema_template)
+    yield db
+    db.close()
 
-    yield db_path
 
-    # Cleanup
-    if os.path.exists(db_path):
-        os.unlink(db_path)
+# RAM-backed directory for database files when the system has one, so
+# file-database tests do not wait on disk syncs
+_SHM_DIR = Path('/dev/shm')
 
 
 @pytest.fixture
-def populated_db(in_memory_db):
-    """Provide a database populated with test data."""
-    db = in_memory_db
+def temp_db_file(request, tmp_path_factory):
+    """
+    Provide a temporary database file that is cleaned up after test.
+
+    Each file gets a directory of its own (named after the xdist worker when
+    run with -n), which also holds its -wal/-shm files. The directory is on
+    /dev/shm where available.
+    """
+    worker_id = getattr(request.config, 'workerinput', {}).get('workerid', 'master')
+    if _SHM_DIR.is_dir() and os.access(_SHM_DIR, os.W_OK):
+        db_dir = Path(tempfile.mkdtemp(prefix=f"db-{worker_id}-", dir=_SHM_DIR))
+    else:
+        db_dir = tmp_path_factory.mktemp(f"db-{worker_id}")
+
+    yield str(db_dir / 'test.db')
+
+    # Cleanup
+    shutil.rmtree(db_dir, ignore_errors=True)
+
 
+def _populate(db):
+    """Insert the test channel and its videos."""
     # Insert test channel
     test_channel = {
         'id': 'UC_test123',
@@ -70,11 +110,9 @@ def populated_db(in_memory_db):
             }
         }
     }
-    db.insert_channel(test_channel)
-
     # Insert test videos
-    for i in range(3):
-        test_video = {
+    test_videos = [
+        {
             'id': f'video_{i}',
             'snippet': {
                 'channelId': 'UC_test123',
@@ -93,9 +131,64 @@ def populated_db(in_memory_db):
                 'commentCount': str(10 * (i+1))
             }
         }
-        db.insert_video(test_video)
+        for i in range(3)
+    ]
+
+    # Channel and videos go in with a single commit
+    with db.transaction():
+        db.insert_channel(test_channel)
+        db.insert_videos_batch(test_videos)
+
+
+@contextmanager
+def _rolled_back(db):
+    """
+    Run a test against db and undo everything it wrote.
+
+    The test runs inside a savepoint that is rolled back afterwards; its own
+    commits are deferred to the savepoint, as inside transaction(). Buffered
+    quota rows are flushed first so they are rolled back too.
+    """
+    with db.savepoint('test_sp', rollback=True):
+        try:
+            yield db
+        finally:
+            db.flush()
+
+
+@pytest.fixture(scope='session')
+def session_db(_db_schema_template):
+    """One in-memory database for the whole session (copied from the schema template)."""
+    db = _clone(_db_schema_template)
+    yield db
+    db.close()
+
 
+@pytest.fixture(scope='session')
+def session_populated_db(_db_schema_template):
+    """One populated in-memory database for the whole session."""
+    db = _clone(_db_schema_template)
+    _populate(db)
     yield db
+    db.close()
+
+
+@pytest.fixture
+def db(session_db):
+    """
+    Provide an empty database whose writes are rolled back after the test.
+
+    Use in_memory_db instead for tests of commit/rollback behaviour or close().
+    """
+    with _rolled_back(session_db):
+        yield session_db
+
+
+@pytest.fixture
+def populated_db(session_populated_db):
+    """Provide a database populated with test data (writes rolled back after the test)."""
+    with _rolled_back(session_populated_db):
+        yield session_populated_db
 
 
 # ============================================
@@ -124,10 +217,10 @@ demo.org,Demo News,https://www.youtube.com/c/demonews,H,Right,CA,en
     yield csv_path
 
 
-@pytest.fixture
-def test_config_file(temp_dir):
-    """Create a test configuration file."""
-    config_path = temp_dir / "test_config.yaml"
+@pytest.fixture(scope='session')
+def test_config_file(tmp_path_factory):
+    """Create a test configuration file (once per session; treat it as read-only)."""
+    config_path = tmp_path_factory.mktemp('config') / "test_config.yaml"
 
     config_content = """
 api:
@@ -164,6 +257,12 @@ output:
     yield config_path
 
 
+@pytest.fixture
+def parsed_test_config(test_config_file):
+    """The test configuration, parsed once per session."""
+    return _parse_yaml(str(test_config_file))
+
+
 # ============================================
 # API Response Fixtures
 # ============================================
@@ -290,6 +389,14 @@ def sample_comment_response():
 # Mock API Client
 # ============================================
 
+@pytest.fixture(autouse=True)
+def _fresh_youtube_service():
+    """Stop clients reusing a service object built under another test's patch."""
+    _shared_youtube.cache_clear()
+    yield
+    _shared_youtube.cache_clear()
+
+
 @pytest.fixture
 def mock_youtube_client(mocker, sample_channel_response, sample_video_response, sample_comment_response):
     """Provide a mocked YouTube API client."""
@@ -304,6 +411,28 @@ def mock_youtube_client(mocker, sample_channel_response, sample_video_response,
     return mock_client
 
 
+# ============================================
+# Real API Fixtures (tests marked api)
+# ============================================
+
+@pytest.fixture(scope='session')
+def api_key():
+    """Real YouTube API key from config/config.yaml; skips the test if not configured."""
+    config_path = Path(__file__).parent.parent / 'config' / 'config.yaml'
+    if not config_path.exists():
+        pytest.skip(f"No API config at {config_path}")
+    key = (_parse_yaml(str(config_path)) or {}).get('api', {}).get('youtube_api_key')
+    if not key or key == "YOUR_YOUTUBE_API_KEY_HERE":
+        pytest.skip("YouTube API key not configured")
+    return key
+
+
+@pytest.fixture(scope='session')
+def youtube_client(api_key):
+    """One real YouTube API client shared by all API tests in the session."""
+    return YouTubeAPIClient(api_key)
+
+
 # ============================================
 # Pytest Configuration
 # ============================================
@@ -6,7 +6,9 @@ import pytest
 import yaml
 from pathlib import Path
 
-from src.utils.helpers import load_sources_from_csv
+from itertools import islice
+
+from src.utils.helpers import load_sources_from_csv, iter_sources_from_csv
 
 
 @pytest.mark.e2e
@@ -14,10 +16,9 @@ from src.utils.helpers import load_sources_from_csv
 class TestCollectionFlow:
     """Test end-to-end collection workflows."""
 
-    def test_config_loading(self, test_config_file):
+    def test_config_loading(self, parsed_test_config):
         """Test configuration file loading."""
-        with open(test_config_file) as f:
-            config = yaml.safe_load(f)
+        config = parsed_test_config
 
         assert config is not None
         assert 'api' in config
@@ -33,7 +34,22 @@ class TestCollectionFlow:
         assert sources[0]['domain'] == 'example.com'
         assert sources[0]['brand_name'] == 'Example News'
 
-    def test_minimal_collection_workflow(self, test_csv_file, test_config_file, temp_dir):
+    def test_csv_loading_without_parquet(self, test_csv_file, monkeypatch):
+        """No sources cache is written when there is no Parquet engine."""
+        import src.utils.helpers as helpers
+        monkeypatch.setattr(helpers, '_HAVE_PARQUET', False)
+
+        assert len(load_sources_from_csv(str(test_csv_file))) == 3
+        assert not Path(f"{test_csv_file}.parquet").exists()
+
+    def test_lazy_csv_loading(self, test_csv_file):
+        """Test streaming only the first sources from CSV."""
+        sources = list(islice(iter_sources_from_csv(str(test_csv_file)), 2))
+
+        assert [s['brand_name'] for s in sources] == ['Example News', 'Test Channel']
+        assert sources == load_sources_from_csv(str(test_csv_file))[:2]
+
+    def test_minimal_collection_workflow(self, test_csv_file, parsed_test_config, temp_dir):
         """Test minimal collection with mocked data.
 
         Note: This is a smoke test, not a real collection.
@@ -41,8 +57,7 @@ class TestCollectionFlow:
         and made optional.
         """
         # Load config
-        with open(test_config_file) as f:
-            config = yaml.safe_load(f)
+        config = parsed_test_config
 
         # Load sources
         sources = load_sources_from_csv(str(test_csv_file))
@@ -80,12 +95,12 @@ class TestDataExport:
         csv_file = temp_dir / 'channels_export.csv'
 
         cursor.execute("SELECT channel_id, channel_title, subscriber_count FROM channels")
-        rows = cursor.fetchall()
 
+        # Rows are streamed from the cursor rather than fetched up front
         with open(csv_file, 'w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(['channel_id', 'channel_title', 'subscriber_count'])
-            writer.writerows(rows)
+            writer.writerows(cursor)
 
         # Verify export
         assert csv_file.exists()
@@ -99,9 +114,13 @@ class TestDataExport:
     def test_json_export(self, populated_db, temp_dir):
         """Test exporting database to JSON."""
         import json
+        import sqlite3
+        orjson = pytest.importorskip('orjson')
 
         db = populated_db
-        cursor = db.cursor
+        # Own cursor so the shared connection keeps returning plain tuples
+        cursor = db.conn.cursor()
+        cursor.row_factory = sqlite3.Row
 
         # Export videos to JSON
         json_file = temp_dir / 'videos_export.json'
@@ -111,16 +130,13 @@ class TestDataExport:
             FROM videos
         """)
 
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-
-        videos = []
-        for row in rows:
-            video = dict(zip(columns, row))
-            videos.append(video)
-
-        with open(json_file, 'w') as f:
-            json.dump(videos, f, indent=2)
+        # Write one object per row as the cursor yields it
+        with open(json_file, 'wb') as f:
+            f.write(b'[')
+            for i, row in enumerate(cursor):
+                f.write(b',\n' if i else b'\n')
+                f.write(orjson.dumps(dict(row)))
+            f.write(b'\n]')
 
         # Verify export
         assert json_file.exists()
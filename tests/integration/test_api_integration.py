@@ -0,0 +1,26 @@
+"""
+Integration tests against the real YouTube API
+These use quota and are skipped unless config/config.yaml has an API key
+"""
+import pytest
+from itertools import islice
+from pathlib import Path
+
+from src.utils.helpers import iter_sources_from_csv
+from test_pipeline import run_mini_collection
+
+SOURCES_CSV = Path(__file__).parent.parent.parent / 'data' / 'sources.csv'
+
+
+@pytest.mark.api
+@pytest.mark.integration
+class TestMiniCollection:
+    """Run the full pipeline on a couple of real channels."""
+
+    def test_mini_collection(self, api_key, tmp_path):
+        """Collect 2 channels into a throwaway database."""
+        if not SOURCES_CSV.exists():
+            pytest.skip(f"No sources file at {SOURCES_CSV}")
+        sources = list(islice(iter_sources_from_csv(str(SOURCES_CSV)), 2))
+
+        assert run_mini_collection(api_key, sources, tmp_path, num_channels=2)
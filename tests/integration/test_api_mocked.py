@@ -3,36 +3,93 @@ Integration tests for YouTube API client (with mocking)
 Tests the API client logic without consuming quota
 """
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from itertools import product
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httplib2
+from googleapiclient.errors import HttpError
 
 from src.youtube_client import YouTubeAPIClient
 
+try:
+    import orjson
+    _dumps, _loads = orjson.dumps, orjson.loads
+except ImportError:  # optional speedup
+    import json
+    _dumps = lambda obj: json.dumps(obj).encode()
+    _loads = json.loads
+
+
+def _fake_youtube(**responses):
+    """
+    Stub YouTube service: service.<resource>().list(**kwargs).execute()
+
+    Each keyword names a resource (channels, videos, ...) and gives what
+    execute() returns; a list is consumed one response per call, and
+    exceptions are raised. Responses can be swapped mid-test through
+    service.responses, and list() keyword arguments are recorded in
+    service.calls[resource].
+    """
+    calls = {name: [] for name in responses}
+
+    def resource(name):
+        def execute():
+            response = responses[name]
+            if isinstance(response, list):
+                response = response.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        def list_(**kwargs):
+            calls[name].append(kwargs)
+            return SimpleNamespace(execute=execute)
+
+        return lambda: SimpleNamespace(list=list_)
+
+    return SimpleNamespace(responses=responses, calls=calls,
+                           **{name: resource(name) for name in responses})
+
+
+def _http_error(status, content):
+    """HttpError as raised by the API client for an HTTP status"""
+    return HttpError(resp=httplib2.Response({'status': status}), content=content)
+
 
 @pytest.mark.integration
+@patch('src.youtube_client.build')
 class TestYouTubeClientMocked:
-    """Test YouTube API client with mocked responses."""
+    """
+    Test YouTube API client with mocked responses.
+
+    build() is patched for every test, which sets the stub service it
+    returns before creating its own client.
+    """
 
-    @patch('src.youtube_client.build')
     def test_client_initialization(self, mock_build):
         """Test API client initialization."""
-        mock_youtube = MagicMock()
-        mock_build.return_value = mock_youtube
+        mock_build.return_value = _fake_youtube()
 
         client = YouTubeAPIClient(api_key="test_key", max_retries=3)
 
         assert client.api_key == "test_key"
         assert client.max_retries == 3
         assert client.quota_usage == 0
-        mock_build.assert_called_once_with('youtube', 'v3', developerKey='test_key')
+        mock_build.assert_called_once_with('youtube', 'v3', developerKey='test_key',
+                                           cache_discovery=False, static_discovery=True)
+
+    def test_clients_share_service(self, mock_build):
+        """Test clients for the same key on one thread build the service once."""
+        first = YouTubeAPIClient(api_key="test_key")
+        second = YouTubeAPIClient(api_key="test_key")
+
+        assert first.youtube is second.youtube
+        assert mock_build.call_count == 1
 
-    @patch('src.youtube_client.build')
     def test_get_channel_info(self, mock_build, sample_channel_response):
         """Test fetching channel information."""
-        mock_youtube = MagicMock()
-        mock_build.return_value = mock_youtube
-
-        # Mock the API response
-        mock_youtube.channels().list().execute.return_value = sample_channel_response
+        mock_build.return_value = _fake_youtube(channels=sample_channel_response)
 
         client = YouTubeAPIClient(api_key="test_key")
         result = client.get_channel_info("UC_sample123")
@@ -42,13 +99,9 @@ class TestYouTubeClientMocked:
         assert result['snippet']['title'] == 'Sample Channel'
         assert client.quota_usage > 0
 
-    @patch('src.youtube_client.build')
     def test_get_video_details(self, mock_build, sample_video_response):
         """Test fetching video details."""
-        mock_youtube = MagicMock()
-        mock_build.return_value = mock_youtube
-
-        mock_youtube.videos().list().execute.return_value = sample_video_response
+        mock_build.return_value = _fake_youtube(videos=sample_video_response)
 
         client = YouTubeAPIClient(api_key="test_key")
         result = client.get_video_details(["video123"])
@@ -57,26 +110,141 @@ class TestYouTubeClientMocked:
         assert result[0]['id'] == 'video123'
         assert result[0]['snippet']['title'] == 'Sample Video Title'
 
-    @patch('src.youtube_client.build')
-    def test_retry_on_failure(self, mock_build):
-        """Test retry logic on API failure."""
-        from googleapiclient.errors import HttpError
-        from http.client import HTTPResponse
+    def test_get_channels_info_batches(self, mock_build, sample_channel_response):
+        """Test channel lookups are batched 50 IDs per request."""
+        youtube = mock_build.return_value = _fake_youtube(channels=sample_channel_response)
+
+        client = YouTubeAPIClient(api_key="test_key")
+        channel_ids = [f"UC{i:022d}" for i in range(120)]
+        result = client.get_channels_info(channel_ids + channel_ids[:10] + ["@handle", "UC!not-a-channel-id!!!!!", None])
 
-        mock_youtube = MagicMock()
-        mock_build.return_value = mock_youtube
+        assert len(youtube.calls['channels']) == 3
+        first_batch = youtube.calls['channels'][0]['id']
+        assert len(first_batch.split(',')) == 50
+        assert client.quota_usage == 3
+        assert result['UC_sample123']['snippet']['title'] == 'Sample Channel'
+
+        # IDs missing from the response are remembered as not found
+        assert client.get_channel_info(channel_ids[0]) is None
+        assert client.quota_usage == 3
+
+    def test_channel_lookups_are_cached(self, mock_build, sample_channel_response):
+        """Test repeated channel lookups, including misses, reuse earlier results."""
+        youtube = mock_build.return_value = _fake_youtube(channels=sample_channel_response,
+                                                          search={'items': []})
+
+        client = YouTubeAPIClient(api_key="test_key")
+        first = client.get_channel_info("UC_sample123")
+        assert client.get_channel_info("UC_sample123") is first
+        quota_after_hit = client.quota_usage
 
-        # Mock HTTP error
-        mock_response = Mock(spec=HTTPResponse)
-        mock_response.status = 500
-        error = HttpError(resp=mock_response, content=b'Server Error')
+        youtube.responses['channels'] = {'items': []}
+        assert client.get_channel_info("missingchannel") is None
+        quota_after_miss = client.quota_usage
+        assert client.get_channel_info("missingchannel") is None
+
+        assert quota_after_hit == 1
+        assert client.quota_usage == quota_after_miss
+
+    def test_handle_lookup_uses_for_handle(self, mock_build, sample_channel_response):
+        """Test a handle is resolved with one forHandle call."""
+        youtube = mock_build.return_value = _fake_youtube(channels=sample_channel_response)
+
+        client = YouTubeAPIClient(api_key="test_key")
+        channel = client.get_channel_info("@samplechannel")
+
+        assert channel == sample_channel_response['items'][0]
+        assert youtube.calls['channels'] == [
+            {'part': 'snippet,statistics,contentDetails', 'forHandle': '@samplechannel'}
+        ]
+        assert client.quota_usage == 1
+
+    def test_get_channel_videos_many(self, mock_build, sample_channel_response, db):
+        """Test concurrent per-channel fetch with quota tracked from worker threads."""
+        mock_build.return_value = _fake_youtube(
+            channels=sample_channel_response,
+            playlistItems={
+                'items': [{
+                    'contentDetails': {'videoId': 'video123'},
+                    'snippet': {
+                        'publishedAt': '2024-01-01T00:00:00Z',
+                        'title': 'Sample Video Title',
+                        'description': '',
+                        'channelTitle': 'Sample Channel'
+                    }
+                }]
+            }
+        )
+
+        run_id = db.start_collection_run()
+        client = YouTubeAPIClient(api_key="test_key", db=db, run_id=run_id)
+        channel_ids = ["UC_chan_a", "UC_chan_b", "UC_chan_c"]
+        result = client.get_channel_videos_many(channel_ids, max_results=10, max_workers=3)
+
+        assert list(result) == channel_ids
+        assert all(videos[0]['video_id'] == 'video123' for videos in result.values())
+        assert client.quota_usage == 6
+
+        db.flush()
+        db.cursor.execute("SELECT SUM(quota_cost) FROM quota_tracking WHERE run_id = ?", (run_id,))
+        assert db.cursor.fetchone()[0] == 6
+
+    def test_flush_quota_writes_buffered_rows(self, mock_build, sample_video_response, db):
+        """Test quota rows tracked per request reach the database on flush_quota()."""
+        mock_build.return_value = _fake_youtube(videos=sample_video_response)
+
+        run_id = db.start_collection_run()
+        client = YouTubeAPIClient(api_key="test_key", db=db, run_id=run_id)
+        client.get_video_details(["video123"])
+        client.get_video_details(["video456"])
+        client.flush_quota()
+
+        db.cursor.execute("SELECT api_method, quota_cost FROM quota_tracking WHERE run_id = ?", (run_id,))
+        assert db.cursor.fetchall() == [('videos.list', 1), ('videos.list', 1)]
+
+    def test_get_video_comments(self, mock_build, sample_comment_response):
+        """Test comment threads are flattened into comments and replies."""
+        mock_build.return_value = _fake_youtube(commentThreads=sample_comment_response)
+
+        client = YouTubeAPIClient(api_key="test_key")
+        comments = client.get_video_comments("video123")
+
+        assert [c['comment_id'] for c in comments] == ['comment123', 'reply123']
+        assert comments[0]['parent_id'] is None
+        assert comments[0]['reply_count'] == 2
+        assert comments[1]['parent_id'] == 'comment123'
+        assert comments[1]['author_channel_id'] == 'UC_reply123'
+
+    def test_quota_counters_thread_safe(self, mock_build):
+        """Test concurrent requests do not lose quota increments."""
+        import threading
+
+        request = SimpleNamespace(execute=lambda: {})
+        client = YouTubeAPIClient(api_key="test_key", initial_quota=10)
+
+        def worker():
+            for _ in range(500):
+                client._make_request(request, quota_cost=2)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert client.get_quota_usage() == 4000
+        assert client.get_quota_cumulative() == 4010
+
+    def test_retry_on_failure(self, mock_build):
+        """Test retry logic on API failure."""
+        error = _http_error(500, b'Server Error')
 
         # First two calls fail, third succeeds
-        mock_youtube.channels().list().execute.side_effect = [
+        mock_build.return_value = _fake_youtube(channels=[
             error,
             error,
             {'items': [{'id': 'UC_test', 'snippet': {'title': 'Test'}}]}
-        ]
+        ])
 
         client = YouTubeAPIClient(api_key="test_key", max_retries=3, retry_delay=0.1)
         result = client.get_channel_info("UC_test")
@@ -84,25 +252,19 @@ class TestYouTubeClientMocked:
         assert result is not None
         assert result['id'] == 'UC_test'
 
-    @patch('src.youtube_client.build')
     def test_quota_exceeded_error(self, mock_build):
-        """Test handling of quota exceeded error."""
-        from googleapiclient.errors import HttpError
-        from http.client import HTTPResponse
+        """Test a quota exceeded error is raised at once, without retries."""
+        youtube = mock_build.return_value = _fake_youtube(
+            channels=[_http_error(403, b'Quota Exceeded'), {'items': []}]
+        )
 
-        mock_youtube = MagicMock()
-        mock_build.return_value = mock_youtube
-
-        mock_response = Mock(spec=HTTPResponse)
-        mock_response.status = 403
-        error = HttpError(resp=mock_response, content=b'Quota Exceeded')
-
-        mock_youtube.channels().list().execute.side_effect = error
-
-        client = YouTubeAPIClient(api_key="test_key")
+        client = YouTubeAPIClient(api_key="test_key", max_retries=3, retry_delay=0)
+        request = client.youtube.channels().list(part='snippet', id='UC_test')
 
         with pytest.raises(HttpError):
-            client.get_channel_info("UC_test")
+            client._make_request(request, api_method='channels.list')
+        assert youtube.responses['channels'] == [{'items': []}]
+        assert client.quota_usage == 0
 
 
 @pytest.mark.integration
@@ -110,35 +272,36 @@ class TestYouTubeClientMocked:
 class TestDatabaseIntegration:
     """Test database integration with realistic workflows."""
 
-    def test_full_collection_workflow(self, in_memory_db):
+    def test_full_collection_workflow(self, db):
         """Test complete collection workflow: channel → videos → comments."""
-        db = in_memory_db
-
-        # Insert channel
-        channel = {
-            'id': 'UC_workflow',
-            'snippet': {'title': 'Workflow Channel', 'publishedAt': '2020-01-01T00:00:00Z'},
-            'statistics': {'subscriberCount': '5000', 'videoCount': '50', 'viewCount': '500000'}
-        }
-        db.insert_channel(channel)
-
-        # Insert videos
-        for i in range(3):
-            video = {
-                'id': f'video_wf_{i}',
-                'snippet': {
-                    'channelId': 'UC_workflow',
-                    'title': f'Workflow Video {i}',
-                    'publishedAt': f'2024-0{i+1}-01T00:00:00Z'
-                },
-                'statistics': {'viewCount': str(1000 * (i+1)), 'likeCount': str(100 * (i+1)), 'commentCount': str(10 * (i+1))}
+        # All inserts share one transaction, committed once at the end
+        with db.transaction():
+            # Insert channel
+            channel = {
+                'id': 'UC_workflow',
+                'snippet': {'title': 'Workflow Channel', 'publishedAt': '2020-01-01T00:00:00Z'},
+                'statistics': {'subscriberCount': '5000', 'videoCount': '50', 'viewCount': '500000'}
             }
-            db.insert_video(video)
+            db.insert_channel(channel)
+
+            # Insert videos
+            videos = [
+                {
+                    'id': f'video_wf_{i}',
+                    'snippet': {
+                        'channelId': 'UC_workflow',
+                        'title': f'Workflow Video {i}',
+                        'publishedAt': f'2024-0{i+1}-01T00:00:00Z'
+                    },
+                    'statistics': {'viewCount': str(1000 * (i+1)), 'likeCount': str(100 * (i+1)), 'commentCount': str(10 * (i+1))}
+                }
+                for i in range(3)
+            ]
+            assert db.insert_videos_batch(videos) is True
 
-        # Insert comments
-        for v in range(3):
-            for c in range(5):
-                comment = {
+            # Insert comments (5 per video)
+            def build_comment(v, c):
+                return {
                     'comment_id': f'comment_wf_{v}_{c}',
                     'video_id': f'video_wf_{v}',
                     'text': f'Comment {c} on video {v}',
@@ -147,33 +310,30 @@ class TestDatabaseIntegration:
                     'like_count': c,
                     'published_at': '2024-02-01T00:00:00Z'
                 }
-                db.insert_comment(comment)
+
+            comments = [build_comment(v, c) for v, c in product(range(3), range(5))]
+            assert db.insert_comments_batch(comments) is True
 
         # Verify data integrity
         cursor = db.cursor
 
         # Check channel
-        cursor.execute("SELECT COUNT(*) FROM channels WHERE channel_id = 'UC_workflow'")
-        assert cursor.fetchone()[0] == 1
+        assert cursor.execute(
+            "SELECT COUNT(*) FROM channels WHERE channel_id = 'UC_workflow'").fetchone() == (1,)
 
         # Check videos
-        cursor.execute("SELECT COUNT(*) FROM videos WHERE channel_id = 'UC_workflow'")
-        assert cursor.fetchone()[0] == 3
+        assert cursor.execute(
+            "SELECT COUNT(*) FROM videos WHERE channel_id = 'UC_workflow'").fetchone() == (3,)
 
-        # Check comments
-        cursor.execute("""
+        # Check comments (both sides of the join are index lookups)
+        assert cursor.execute("""
             SELECT COUNT(*) FROM comments c
             JOIN videos v ON c.video_id = v.video_id
             WHERE v.channel_id = 'UC_workflow'
-        """)
-        assert cursor.fetchone()[0] == 15  # 3 videos * 5 comments
+        """).fetchone() == (15,)  # 3 videos * 5 comments
 
-    def test_checkpoint_save_and_restore(self, temp_dir, in_memory_db):
+    def test_checkpoint_save_and_restore(self):
         """Test checkpoint functionality."""
-        import json
-
-        checkpoint_file = temp_dir / 'test_checkpoint.json'
-
         # Create checkpoint data
         checkpoint = {
             'channel_index': 50,
@@ -186,13 +346,11 @@ class TestDatabaseIntegration:
             }
         }
 
-        # Save checkpoint
-        with open(checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f)
+        # Save checkpoint (in memory; no file needed for the round trip)
+        buf = _dumps(checkpoint)
 
         # Load checkpoint
-        with open(checkpoint_file, 'r') as f:
-            loaded = json.load(f)
+        loaded = _loads(buf)
 
         assert loaded['channel_index'] == 50
         assert loaded['stats']['channels_success'] == 45
@@ -3,7 +3,6 @@ Unit tests for database operations
 """
 import pytest
 import sqlite3
-from datetime import datetime
 
 from src.database import Database
 
@@ -22,15 +21,51 @@ class TestDatabaseCreation:
         assert db.cursor is not None
         db.close()
 
+    def test_in_memory_database_skips_syncs(self, in_memory_db):
+        """In-memory databases run without syncs but keep a rollback journal."""
+        cursor = in_memory_db.cursor
+        assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 0
+        assert cursor.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == 'memory'
+
+    def test_in_memory_database_autocommits(self, in_memory_db):
+        """In-memory writes outside transaction() leave no transaction open."""
+        db = in_memory_db
+        assert db.conn.isolation_level is None
+
+        db.insert_channel({'id': 'UC_auto', 'snippet': {'title': 'Auto'}, 'statistics': {}})
+        assert not db.conn.in_transaction
+
+    def test_from_connection(self, in_memory_db):
+        """A Database wrapping a backup copy has the schema and its settings."""
+        conn = sqlite3.connect(":memory:")
+        in_memory_db.conn.backup(conn)
+        db = Database.from_connection(conn)
+
+        assert db.conn is conn
+        assert db.insert_channel({'id': 'UC_copy', 'snippet': {'title': 'Copy'}, 'statistics': {}})
+        assert db.cursor.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        db.close()
+
     def test_create_file_database(self, temp_db_file):
         """Create file-based database."""
         db = Database(db_path=temp_db_file)
         assert db.conn is not None
         db.close()
 
-    def test_tables_created(self, in_memory_db):
+    def test_file_database_uses_wal(self, temp_db_file):
+        """File databases use WAL with relaxed syncs and a larger page cache."""
+        db = Database(db_path=temp_db_file)
+        cursor = db.cursor
+        assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert cursor.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert cursor.execute("PRAGMA cache_size").fetchone()[0] == -65536
+        # sqlite3.connect's default 5 s timeout waits out other writers' locks
+        assert cursor.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        db.close()
+
+    def test_tables_created(self, db):
         """Verify all required tables are created."""
-        db = in_memory_db
         cursor = db.cursor
 
         # Check table existence
@@ -46,9 +81,17 @@ class TestDatabaseCreation:
         }
         assert expected_tables.issubset(tables)
 
-    def test_foreign_keys_enabled(self, in_memory_db):
+    def test_planner_statistics_gathered(self, db):
+        """A new database is analyzed and maintenance() runs cleanly."""
+        cursor = db.cursor
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        assert cursor.fetchone() is not None
+
+        db.maintenance()
+
+    def test_foreign_keys_enabled(self, db):
         """Verify foreign keys are enabled."""
-        db = in_memory_db
         cursor = db.cursor
 
         cursor.execute("PRAGMA foreign_keys")
@@ -56,6 +99,18 @@ class TestDatabaseCreation:
         assert result[0] == 1  # Foreign keys enabled
 
 
+    def test_channel_url_view(self, populated_db):
+        """channel_url is derived by the channels_v view, not stored."""
+        db = populated_db
+        cursor = db.cursor
+
+        cursor.execute("PRAGMA table_info(channels)")
+        assert 'channel_url' not in {row[1] for row in cursor.fetchall()}
+
+        cursor.execute("SELECT channel_url FROM channels_v WHERE channel_id = 'UC_test123'")
+        assert cursor.fetchone()[0] == 'https://www.youtube.com/channel/UC_test123'
+
+
 # ============================================
 # Channel Operations Tests
 # ============================================
@@ -63,9 +118,8 @@ class TestDatabaseCreation:
 class TestChannelOperations:
     """Test channel insert and query operations."""
 
-    def test_insert_channel(self, in_memory_db):
+    def test_insert_channel(self, db):
         """Insert a channel successfully."""
-        db = in_memory_db
 
         channel_data = {
             'id': 'UC_test123',
@@ -103,9 +157,8 @@ class TestChannelOperations:
         assert row[0] == 'UC_test123'
         assert row[1] == 'Test Channel'
 
-    def test_upsert_channel(self, in_memory_db):
-        """Test INSERT OR REPLACE behavior."""
-        db = in_memory_db
+    def test_upsert_channel(self, db):
+        """Test upsert behavior."""
 
         channel_data = {
             'id': 'UC_test123',
@@ -136,9 +189,21 @@ class TestChannelOperations:
         assert row[0] == 'Updated Title'
         assert row[1] == 20000
 
-    def test_insert_channel_with_source_metadata(self, in_memory_db):
+    def test_upsert_keeps_first_collected_at(self, db):
+        """Updating a channel keeps its original first_collected_at."""
+        channel_data = {'id': 'UC_first', 'snippet': {'title': 'First'}, 'statistics': {}}
+
+        db.insert_channel(channel_data)
+        db.cursor.execute("UPDATE channels SET first_collected_at = '2020-01-01T00:00:00'")
+        db.insert_channel(channel_data)
+
+        db.cursor.execute("SELECT first_collected_at, last_updated_at FROM channels")
+        first_collected_at, last_updated_at = db.cursor.fetchone()
+        assert first_collected_at == '2020-01-01T00:00:00'
+        assert last_updated_at > first_collected_at
+
+    def test_insert_channel_with_source_metadata(self, db):
         """Insert channel with source metadata."""
-        db = in_memory_db
 
         channel_data = {
             'id': 'UC_test123',
@@ -172,6 +237,21 @@ class TestChannelOperations:
         assert row[2] == 'Center'
 
 
+    def test_get_channel_by_id_sees_updates(self, populated_db):
+        """Cached channel lookups are invalidated by insert_channel."""
+        db = populated_db
+
+        assert db.get_channel_by_id('UC_test123')['channel_title'] == 'Test Channel'
+
+        db.insert_channel({
+            'id': 'UC_test123',
+            'snippet': {'title': 'Renamed Channel'},
+            'statistics': {}
+        })
+        assert db.get_channel_by_id('UC_test123')['channel_title'] == 'Renamed Channel'
+        assert db.get_channel_by_id('UC_missing') is None
+
+
 # ============================================
 # Video Operations Tests
 # ============================================
@@ -215,9 +295,37 @@ class TestVideoOperations:
         assert row[0] == 'video_new'
         assert row[1] == 'New Video'
 
-    def test_video_foreign_key_constraint(self, in_memory_db):
+    def test_batch_insert_videos(self, populated_db):
+        """Insert multiple videos in a single batch."""
+        db = populated_db
+
+        videos = [{
+            'id': f'batch_video_{i}',
+            'snippet': {
+                'channelId': 'UC_test123',
+                'title': f'Batch Video {i}',
+                'publishedAt': '2024-03-01T00:00:00Z',
+                'tags': ['batch'] if i else []
+            },
+            'contentDetails': {'duration': 'PT1M'},
+            'statistics': {'viewCount': '100'}
+        } for i in range(5)]
+
+        result = db.insert_videos_batch(videos)
+        assert result is True
+
+        cursor = db.cursor
+        cursor.execute("""
+            SELECT video_id, tags, duration_seconds FROM videos
+            WHERE video_id LIKE 'batch_video_%' ORDER BY video_id
+        """)
+        rows = cursor.fetchall()
+        assert len(rows) == 5
+        assert rows[0] == ('batch_video_0', '[]', 60)
+        assert rows[1][1] == '["batch"]'
+
+    def test_video_foreign_key_constraint(self, db):
         """Test foreign key constraint on channel_id."""
-        db = in_memory_db
 
         video_data = {
             'id': 'video_orphan',
@@ -331,6 +439,21 @@ class TestCommentOperations:
         count = cursor.fetchone()[0]
         assert count == 10
 
+    def test_batch_insert_keeps_valid_comments(self, populated_db):
+        """A comment for an unknown video fails alone; the rest are inserted."""
+        db = populated_db
+
+        comments = [
+            {'comment_id': 'ok_comment', 'video_id': 'video_0', 'text': 'Fine'},
+            {'comment_id': 'orphan_comment', 'video_id': 'no_such_video', 'text': 'Orphan'},
+        ]
+
+        assert db.insert_comments_batch(comments) is False
+
+        cursor = db.cursor
+        cursor.execute("SELECT comment_id FROM comments WHERE comment_id IN ('ok_comment', 'orphan_comment')")
+        assert cursor.fetchall() == [('ok_comment',)]
+
 
 # ============================================
 # Query Operations Tests
@@ -438,6 +561,139 @@ class TestTransactions:
         assert result[0] == 'UC_autocommit'
 
 
+    def test_transaction_defers_commit(self, in_memory_db):
+        """Inserts inside transaction() are committed once on exit."""
+        db = in_memory_db
+
+        with db.transaction():
+            db.insert_channel({
+                'id': 'UC_txn',
+                'snippet': {'title': 'Txn Test'},
+                'statistics': {}
+            })
+            assert db.conn.in_transaction
+
+        assert not db.conn.in_transaction
+        db.cursor.execute("SELECT COUNT(*) FROM channels WHERE channel_id = 'UC_txn'")
+        assert db.cursor.fetchone()[0] == 1
+
+    def test_transaction_rolls_back_on_error(self, in_memory_db):
+        """An exception inside transaction() discards the whole block."""
+        db = in_memory_db
+
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.insert_channel({
+                    'id': 'UC_txn_fail',
+                    'snippet': {'title': 'Txn Fail'},
+                    'statistics': {}
+                })
+                assert db.get_channel_by_id('UC_txn_fail') is not None
+                raise RuntimeError("abort")
+
+        db.cursor.execute("SELECT COUNT(*) FROM channels WHERE channel_id = 'UC_txn_fail'")
+        assert db.cursor.fetchone()[0] == 0
+        assert db.get_channel_by_id('UC_txn_fail') is None
+
+    def test_savepoint_rollback(self, in_memory_db):
+        """savepoint(rollback=True) undoes the block but keeps earlier writes."""
+        db = in_memory_db
+
+        with db.transaction():
+            db.insert_channel({'id': 'UC_kept', 'snippet': {'title': 'Kept'}, 'statistics': {}})
+            with db.savepoint('inner', rollback=True):
+                db.insert_channel({'id': 'UC_undone', 'snippet': {'title': 'Undone'}, 'statistics': {}})
+                assert db.get_channel_by_id('UC_undone') is not None
+
+        assert db.get_channel_by_id('UC_kept') is not None
+        assert db.get_channel_by_id('UC_undone') is None
+
+
+# ============================================
+# Quota Tracking Tests
+# ============================================
+
+class TestQuotaTracking:
+    """Test per-call quota tracking."""
+
+    def test_track_quota_usage(self, db):
+        """Track ids are sequential within a run and timestamps are epoch ints."""
+        run_id = db.start_collection_run()
+
+        db.track_quota_usage(run_id, 'channels.list', 1)
+        db.track_quota_usage(run_id, 'search.list', 100)
+        db.flush()
+
+        cursor = db.cursor
+        cursor.execute("""
+            SELECT track_id, ts, api_method, quota_cost FROM quota_tracking
+            WHERE run_id = ? ORDER BY track_id
+        """, (run_id,))
+        rows = cursor.fetchall()
+        assert [row[0] for row in rows] == [1, 2]
+        assert all(isinstance(row[1], int) for row in rows)
+        assert [row[3] for row in rows] == [1, 100]
+
+    def test_quota_rows_buffered_until_flush(self, db):
+        """Quota rows are held in memory until flushed or the batch fills."""
+        run_id = db.start_collection_run()
+
+        db.track_quota_usage(run_id, 'videos.list', 1)
+        db.cursor.execute("SELECT COUNT(*) FROM quota_tracking")
+        assert db.cursor.fetchone()[0] == 0
+
+        db.end_collection_run(run_id, {})
+        db.cursor.execute("SELECT COUNT(*) FROM quota_tracking")
+        assert db.cursor.fetchone()[0] == 1
+
+    def test_failed_flush_keeps_rows(self, db):
+        """Quota rows that fail to write stay buffered for the next flush."""
+        run_id = db.start_collection_run()
+        db.track_quota_usage(run_id, 'videos.list', 1)
+        db.track_quota_usage(run_id, 'commentThreads.list', 1)
+
+        db.cursor.execute("ALTER TABLE quota_tracking RENAME TO quota_tracking_away")
+        db.flush()
+        db.cursor.execute("ALTER TABLE quota_tracking_away RENAME TO quota_tracking")
+        db.flush()
+
+        db.cursor.execute("SELECT api_method FROM quota_tracking ORDER BY track_id")
+        assert [row[0] for row in db.cursor.fetchall()] == ['videos.list', 'commentThreads.list']
+
+    def test_migrate_legacy_quota_table(self, temp_db_file):
+        """Legacy quota_tracking rows are carried over to the new layout."""
+        conn = sqlite3.connect(temp_db_file)
+        conn.execute("""
+            CREATE TABLE collection_runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_time TEXT,
+                status TEXT
+            )
+        """)
+        conn.execute("INSERT INTO collection_runs (start_time, status) VALUES ('2024-01-01', 'completed')")
+        conn.execute("""
+            CREATE TABLE quota_tracking (
+                track_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER,
+                timestamp TEXT,
+                api_method TEXT,
+                quota_cost INTEGER,
+                details TEXT
+            )
+        """)
+        conn.execute("""
+            INSERT INTO quota_tracking (run_id, timestamp, api_method, quota_cost)
+            VALUES (1, '2024-01-01T00:00:00', 'videos.list', 1)
+        """)
+        conn.commit()
+        conn.close()
+
+        db = Database(db_path=temp_db_file)
+        db.cursor.execute("SELECT run_id, track_id, ts, api_method FROM quota_tracking")
+        assert db.cursor.fetchall() == [(1, 1, 1704067200, 'videos.list')]
+        db.close()
+
+
 # ============================================
 # Index Tests
 # ============================================
@@ -445,9 +701,8 @@ class TestTransactions:
 class TestIndexes:
     """Test that indexes are created."""
 
-    def test_indexes_exist(self, in_memory_db):
+    def test_indexes_exist(self, db):
         """Verify indexes are created."""
-        db = in_memory_db
         cursor = db.cursor
 
         cursor.execute("""
@@ -457,10 +712,27 @@ class TestIndexes:
         indexes = {row[0] for row in cursor.fetchall()}
 
         expected_indexes = {
-            'idx_videos_channel',
+            'idx_videos_channel_covering',
             'idx_videos_published',
             'idx_comments_video',
-            'idx_comments_published'
+            'idx_comments_published',
+            'idx_channels_subscribers',
+            'idx_videos_views',
+            'idx_comments_likes',
+            'idx_comments_author'
         }
 
         assert expected_indexes.issubset(indexes)
+
+    def test_channel_comment_count_uses_indexes(self, db):
+        """Counting a channel's comments probes indexes instead of scanning."""
+        plan = db.cursor.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT COUNT(*) FROM comments c
+            JOIN videos v ON c.video_id = v.video_id
+            WHERE v.channel_id = ?
+        """, ('UC_test',)).fetchall()
+        details = ' '.join(row[-1] for row in plan)
+
+        assert 'COVERING INDEX idx_videos_channel_covering' in details
+        assert 'idx_comments_video' in details
@@ -9,9 +9,13 @@ import json
 from src.utils.helpers import (
     extract_channel_id_from_url,
     format_duration,
+    parse_duration_seconds,
     clean_text,
+    clean_texts,
     calculate_engagement_rate,
+    calculate_engagement_rates,
     categorize_video_length,
+    categorize_video_lengths,
     save_json,
     load_json
 )
@@ -24,48 +28,27 @@ from src.utils.helpers import (
 class TestExtractChannelId:
     """Test channel ID extraction from various URL formats."""
 
-    def test_extract_from_channel_url(self):
-        """Extract channel ID from /channel/ID format."""
-        url = "https://www.youtube.com/channel/UC_test123"
-        assert extract_channel_id_from_url(url) == "UC_test123"
-
-    def test_extract_from_handle_url(self):
-        """Extract handle from /@handle format."""
-        url = "https://www.youtube.com/@testchannel"
-        assert extract_channel_id_from_url(url) == "@testchannel"
-
-    def test_extract_from_custom_url(self):
-        """Extract from /c/customname format."""
-        url = "https://www.youtube.com/c/mynewschannel"
-        assert extract_channel_id_from_url(url) == "mynewschannel"
-
-    def test_extract_from_user_url(self):
-        """Extract from /user/username format."""
-        url = "https://www.youtube.com/user/oldchannel"
-        assert extract_channel_id_from_url(url) == "oldchannel"
-
-    def test_handle_url_with_query_params(self):
-        """Remove query parameters before extraction."""
-        url = "https://www.youtube.com/@testchannel?ab_channel=Test"
-        assert extract_channel_id_from_url(url) == "@testchannel"
-
-    def test_handle_url_with_trailing_slash(self):
-        """Handle URLs with trailing slashes."""
-        url = "https://www.youtube.com/channel/UC_test123/"
-        assert extract_channel_id_from_url(url) == "UC_test123"
-
-    def test_empty_url(self):
-        """Return None for empty URL."""
-        assert extract_channel_id_from_url("") is None
-        assert extract_channel_id_from_url("   ") is None
-
-    def test_none_url(self):
-        """Return None for None input."""
-        assert extract_channel_id_from_url(None) is None
-
-    def test_invalid_url(self):
-        """Return None for invalid YouTube URL."""
-        url = "https://www.example.com/not-youtube"
+    @pytest.mark.parametrize("url,expected", [
+        ("https://www.youtube.com/channel/UC_test123", "UC_test123"),
+        ("https://www.youtube.com/@testchannel", "@testchannel"),
+        ("https://www.youtube.com/c/mynewschannel", "mynewschannel"),
+        ("https://www.youtube.com/user/oldchannel", "oldchannel"),
+        # Query parameters and trailing slashes are ignored
+        ("https://www.youtube.com/@testchannel?ab_channel=Test", "@testchannel"),
+        ("https://www.youtube.com/channel/UC_test123/", "UC_test123"),
+    ], ids=['channel', 'handle', 'custom', 'user', 'query_params', 'trailing_slash'])
+    def test_extract(self, url, expected):
+        """Extract the channel identifier from each URL shape."""
+        assert extract_channel_id_from_url(url) == expected
+
+    @pytest.mark.parametrize("url", [
+        "",
+        "   ",
+        None,
+        "https://www.example.com/not-youtube",
+    ], ids=['empty', 'blank', 'none', 'not_youtube'])
+    def test_no_channel(self, url):
+        """Return None for empty, missing or non-YouTube URLs."""
         assert extract_channel_id_from_url(url) is None
 
 
@@ -76,29 +59,18 @@ class TestExtractChannelId:
 class TestFormatDuration:
     """Test duration formatting."""
 
-    def test_format_seconds_only(self):
-        """Format duration with only seconds."""
-        assert format_duration(45) == "0:45"
-
-    def test_format_minutes_and_seconds(self):
-        """Format duration with minutes and seconds."""
-        assert format_duration(154) == "2:34"
-
-    def test_format_hours(self):
-        """Format duration with hours."""
-        assert format_duration(7215) == "2:00:15"
-
-    def test_format_zero(self):
-        """Format zero duration."""
-        assert format_duration(0) == "0:00"
-
-    def test_format_exact_hour(self):
-        """Format exact hour."""
-        assert format_duration(3600) == "1:00:00"
-
-    def test_format_long_duration(self):
-        """Format very long duration."""
-        assert format_duration(10000) == "2:46:40"
+    @pytest.mark.parametrize("secs,expected", [
+        (45, "0:45"),
+        (154, "2:34"),
+        (7215, "2:00:15"),
+        (0, "0:00"),
+        (3599, "59:59"),
+        (3600, "1:00:00"),
+        (10000, "2:46:40"),
+    ])
+    def test_format(self, secs, expected):
+        """Format seconds as M:SS, or H:MM:SS from an hour up."""
+        assert format_duration(secs) == expected
 
 
 # ============================================
@@ -140,6 +112,14 @@ class TestCleanText:
         """Return empty string for whitespace-only input."""
         assert clean_text("   \n\t  ") == ""
 
+    def test_vectorized_clean(self):
+        """Vectorized cleaning matches the scalar version."""
+        import pandas as pd
+
+        texts = ["This  has   extra    spaces", "  padded\n", "tabs\tand\nlines", None, "   "]
+        expected = [clean_text(t) for t in texts]
+        assert clean_texts(pd.Series(texts)).tolist() == expected
+
 
 # ============================================
 # Tests for calculate_engagement_rate
@@ -181,6 +161,12 @@ class TestCalculateEngagementRate:
         video = {}
         assert calculate_engagement_rate(video) == 0.0
 
+    def test_none_counts(self):
+        """Count None (hidden) statistics as 0."""
+        video = {'view_count': 100, 'like_count': None, 'comment_count': 20}
+        assert calculate_engagement_rate(video) == 0.2
+        assert calculate_engagement_rate({'view_count': None}) == 0.0
+
     def test_string_values(self):
         """Convert string values to int."""
         video = {
@@ -190,6 +176,19 @@ class TestCalculateEngagementRate:
         }
         assert calculate_engagement_rate(video) == 0.15
 
+    def test_vectorized_rates(self):
+        """Vectorized rates match the scalar version."""
+        import pandas as pd
+
+        videos = [
+            {'view_count': 1000, 'like_count': 50, 'comment_count': 10},
+            {'view_count': 0, 'like_count': 10, 'comment_count': 5},
+            {'view_count': '1000', 'like_count': '100', 'comment_count': '50'},
+            {'view_count': 100, 'like_count': None, 'comment_count': 20},
+        ]
+        rates = calculate_engagement_rates(pd.DataFrame(videos))
+        assert rates.tolist() == pytest.approx([0.06, 0.0, 0.15, 0.2])
+
 
 # ============================================
 # Tests for categorize_video_length
@@ -198,43 +197,39 @@ class TestCalculateEngagementRate:
 class TestCategorizeVideoLength:
     """Test video length categorization."""
 
-    def test_very_short(self):
-        """Categorize very short videos (<1 min)."""
-        assert categorize_video_length(30) == 'very_short'
-        assert categorize_video_length(59) == 'very_short'
-
-    def test_short(self):
-        """Categorize short videos (1-5 min)."""
-        assert categorize_video_length(60) == 'short'
-        assert categorize_video_length(299) == 'short'
-
-    def test_medium(self):
-        """Categorize medium videos (5-20 min)."""
-        assert categorize_video_length(300) == 'medium'
-        assert categorize_video_length(1199) == 'medium'
-
-    def test_long(self):
-        """Categorize long videos (20-60 min)."""
-        assert categorize_video_length(1200) == 'long'
-        assert categorize_video_length(3599) == 'long'
-
-    def test_very_long(self):
-        """Categorize very long videos (>1 hour)."""
-        assert categorize_video_length(3600) == 'very_long'
-        assert categorize_video_length(10000) == 'very_long'
-
-    def test_boundary_values(self):
-        """Test exact boundary values."""
-        assert categorize_video_length(60) == 'short'
-        assert categorize_video_length(300) == 'medium'
-        assert categorize_video_length(1200) == 'long'
-        assert categorize_video_length(3600) == 'very_long'
+    @pytest.mark.parametrize("secs,expected", [
+        (30, 'very_short'),
+        (59, 'very_short'),
+        (60, 'short'),
+        (299, 'short'),
+        (300, 'medium'),
+        (1199, 'medium'),
+        (1200, 'long'),
+        (3599, 'long'),
+        (3600, 'very_long'),
+        (10000, 'very_long'),
+    ])
+    def test_categorize(self, secs, expected):
+        """Categorize on either side of each boundary (1, 5, 20 and 60 min)."""
+        assert categorize_video_length(secs) == expected
+
+    def test_vectorized_categories(self):
+        """Vectorized categories match the scalar version."""
+        durations = [0, 59, 60, 299, 300, 1199, 1200, 3599, 3600, 7200]
+        expected = [categorize_video_length(d) for d in durations]
+        assert categorize_video_lengths(durations).tolist() == expected
 
 
 # ============================================
 # Tests for save_json and load_json
 # ============================================
 
+@pytest.fixture(scope='class')
+def temp_dir(tmp_path_factory):
+    """One directory per test class; each test writes its own file name."""
+    return tmp_path_factory.mktemp('json')
+
+
 class TestJsonOperations:
     """Test JSON save and load operations."""
 
@@ -261,6 +256,18 @@ class TestJsonOperations:
         loaded = load_json(str(json_path))
         assert loaded['text'] == 'Hello 世界 🌍'
 
+    def test_save_and_load_json_without_orjson(self, temp_dir, monkeypatch):
+        """Fall back to the stdlib json module when orjson is missing."""
+        import src.utils.helpers as helpers
+        monkeypatch.setattr(helpers, 'orjson', None)
+
+        data = {'text': 'Hello 世界 🌍', 'list': [1, 2, 3]}
+        json_path = temp_dir / 'fallback.json'
+
+        assert save_json(data, str(json_path)) is True
+        assert json.loads(json_path.read_text(encoding='utf-8')) == data
+        assert load_json(str(json_path)) == data
+
     def test_load_nonexistent_file(self):
         """Return None for nonexistent file."""
         result = load_json('/nonexistent/path/file.json')
@@ -290,6 +297,9 @@ class TestJsonOperations:
     ("https://youtube.com/@handle", "@handle"),
     ("http://www.youtube.com/c/custom", "custom"),  # HTTP
     ("https://m.youtube.com/user/mobile", "mobile"),  # Mobile
+    ("youtube.com/@noscheme", "@noscheme"),  # No scheme
+    ("https://www.youtube.com/channel/UCtest/videos", "UCtest"),  # Sub-page
+    ("https://notyoutube.com/@handle", None),  # Other host
 ])
 def test_various_url_formats(url, expected):
     """Test various URL format variations."""
@@ -307,3 +317,19 @@ def test_various_url_formats(url, expected):
 def test_duration_formats(seconds, expected):
     """Test various duration formats."""
     assert format_duration(seconds) == expected
+
+
+@pytest.mark.parametrize("duration,expected", [
+    ("PT45S", 45),
+    ("PT2M34S", 154),
+    ("PT1H", 3600),
+    ("PT2H0M15S", 7215),
+    ("P1DT1M", 86460),
+    ("P0D", 0),
+    ("", None),
+    (None, None),
+    ("5:30", None),
+])
+def test_parse_duration_seconds(duration, expected):
+    """Test ISO 8601 duration parsing."""
+    assert parse_duration_seconds(duration) == expected
@@ -4,187 +4,280 @@ Simple data viewer for inspecting collected YouTube data
 
 import sqlite3
 import argparse
+import hashlib
+import json
+import os
 from pathlib import Path
-from tabulate import tabulate
 import sys
+from typing import Optional
 
+try:
+    from tabulate import tabulate
+except ImportError:
+    print("Error: 'tabulate' package not found")
+    print("Install it with: pip install tabulate")
+    sys.exit(1)
 
-def connect_db(db_path: str):
-    """Connect to database"""
-    if not Path(db_path).exists():
-        print(f"Error: Database not found at {db_path}")
-        sys.exit(1)
-    return sqlite3.connect(db_path)
 
+# Rule printed above and below each section title
+BANNER = '=' * 80
 
-def view_channels(conn, limit=10):
-    """View collected channels"""
-    cursor = conn.cursor()
-    cursor.execute("""
+
+def _clip(column: str, width: int) -> str:
+    """SQL expression for column cut to width characters, with '...' when cut"""
+    return (f"CASE WHEN LENGTH({column}) > {width} "
+            f"THEN SUBSTR({column}, 1, {width}) || '...' ELSE {column} END")
+
+
+# Listing columns; long text is cut in SQL, so only the displayed part is
+# ever decoded into Python strings
+_VIDEO_COLUMNS = f"""
+        {_clip('v.title', 60)}, v.view_count, v.like_count, v.comment_count,
+        SUBSTR(v.published_at, 1, 10), {_clip('c.channel_title', 30)}"""
+_COMMENT_COLUMNS = f"""
+        {_clip('co.author_name', 20)}, {_clip('co.text', 80)}, co.like_count,
+        {_clip('v.title', 40)}"""
+
+# Every query the viewer runs; the same strings are reused on each call, so
+# sqlite3 finds them already prepared in the connection's statement cache
+_SQL = {
+    'channels': """
         SELECT channel_title, subscriber_count, video_count, view_count, 
                source_domain, source_orientation
         FROM channels
         ORDER BY subscriber_count DESC
         LIMIT ?
-    """, (limit,))
+    """,
+    'videos_by_channel': f"""
+        SELECT {_VIDEO_COLUMNS}
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+        WHERE c.channel_title LIKE ?
+        ORDER BY v.published_at DESC
+        LIMIT ?
+    """,
+    'videos': f"""
+        SELECT {_VIDEO_COLUMNS}
+        FROM videos v
+        JOIN channels c ON v.channel_id = c.channel_id
+        ORDER BY v.view_count DESC
+        LIMIT ?
+    """,
+    'comments_by_video': f"""
+        SELECT {_COMMENT_COLUMNS}
+        FROM comments co
+        JOIN videos v ON co.video_id = v.video_id
+        WHERE v.title LIKE ?
+        ORDER BY co.like_count DESC
+        LIMIT ?
+    """,
+    'comments': f"""
+        SELECT {_COMMENT_COLUMNS}
+        FROM comments co
+        JOIN videos v ON co.video_id = v.video_id
+        ORDER BY co.like_count DESC
+        LIMIT ?
+    """,
+    # All headline numbers in one statement (one row back instead of six)
+    'stats': """
+        SELECT (SELECT COUNT(*) FROM channels),
+               (SELECT COUNT(*) FROM videos),
+               (SELECT COUNT(*) FROM comments),
+               (SELECT SUM(view_count) FROM videos),
+               (SELECT AVG(view_count) FROM videos WHERE view_count > 0),
+               (SELECT COUNT(DISTINCT author_channel_id)
+                FROM comments
+                WHERE author_channel_id IS NOT NULL)
+    """,
+    'recent_runs': """
+        SELECT run_id, start_time, end_time, channels_processed, 
+               videos_collected, comments_collected, quota_used, status
+        FROM collection_runs
+        ORDER BY run_id DESC
+        LIMIT 5
+    """,
+}
+
+
+def connect_db(db_path: str):
+    """Connect to database (read-only; the viewer never writes)"""
+    path = Path(db_path)
+    if not path.exists():
+        print(f"Error: Database not found at {db_path}")
+        sys.exit(1)
+    # Not immutable=1: that would skip the WAL, hiding rows a running
+    # collection has not checkpointed yet
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    # Sorts and DISTINCT stay in RAM; 128 MB page cache and 256 MB of
+    # memory-mapped reads for the larger listings
+    conn.executescript("""
+        PRAGMA temp_store = MEMORY;
+        PRAGMA cache_size = -131072;
+        PRAGMA mmap_size = 268435456;
+    """)
+    return conn
+
+
+def _table(rows, headers, colalign) -> str:
+    """
+    Format rows as a grid table
+
+    Cells arrive typed from SQLite, so tabulate is told not to parse them as
+    numbers; colalign keeps count columns right-aligned instead.
+    """
+    return tabulate(rows, headers=headers, tablefmt='grid', colalign=colalign,
+                    disable_numparse=True)
+
+
+def _stats_signature(db_path: str) -> list:
+    """
+    Modification times and sizes of the database and its WAL file
+
+    Writes to a WAL database land in the -wal file until a checkpoint, so
+    the main file alone can look unchanged after new data was added.
+    """
+    signature = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            st = os.stat(path)
+            signature += [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            signature += [None, None]
+    return signature
+
+
+def _stats_cache_path(db_path: str) -> Path:
+    """
+    Stats cache file for a database, under $XDG_CACHE_HOME (or ~/.cache)
+
+    The database itself is opened read-only, so nothing is written next to it;
+    cache files are keyed by a hash of the database's absolute path.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    key = hashlib.sha1(str(Path(db_path).resolve()).encode()).hexdigest()
+    return Path(cache_home) / 'youtube-monitoring' / f"stats-{key}.json"
+
+
+def _load_stats(cursor, db_path: Optional[str]):
+    """
+    Headline counts and recent runs, from the cache if the database is unchanged
+
+    Returns:
+        (counts, runs) where counts is the six stats query values
+    """
+    if db_path:
+        cache_path = _stats_cache_path(db_path)
+        signature = _stats_signature(db_path)
+        try:
+            cached = json.loads(cache_path.read_text())
+            if cached['signature'] == signature:
+                return cached['counts'], cached['runs']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # no usable cache; recompute below
+
+    counts = list(cursor.execute(_SQL['stats']).fetchone())
+    runs = cursor.execute(_SQL['recent_runs']).fetchall()
+
+    if db_path:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(json.dumps(
+                {'signature': signature, 'counts': counts, 'runs': runs}))
+        except OSError:
+            pass  # unwritable cache directory: stats are just recomputed next time
+    return counts, runs
+
+
+def view_channels(cursor, limit=10):
+    """View collected channels"""
+    cursor.execute(_SQL['channels'], (limit,))
     
-    rows = cursor.fetchall()
     headers = ['Channel', 'Subscribers', 'Videos', 'Views', 'Domain', 'Orientation']
     
-    print(f"\n{'='*80}")
+    print(f"\n{BANNER}")
     print(f"Top {limit} Channels by Subscribers")
-    print(f"{'='*80}")
-    print(tabulate(rows, headers=headers, tablefmt='grid'))
+    print(BANNER)
+    print(_table(cursor, headers, ('left', 'right', 'right', 'right', 'left', 'left')))
 
 
-def view_videos(conn, channel_title=None, limit=10):
+def view_videos(cursor, channel_title=None, limit=10):
     """View collected videos"""
-    cursor = conn.cursor()
-    
     if channel_title:
-        cursor.execute("""
-            SELECT v.title, v.view_count, v.like_count, v.comment_count, 
-                   v.published_at, c.channel_title
-            FROM videos v
-            JOIN channels c ON v.channel_id = c.channel_id
-            WHERE c.channel_title LIKE ?
-            ORDER BY v.published_at DESC
-            LIMIT ?
-        """, (f'%{channel_title}%', limit))
+        cursor.execute(_SQL['videos_by_channel'], (f'%{channel_title}%', limit))
     else:
-        cursor.execute("""
-            SELECT v.title, v.view_count, v.like_count, v.comment_count, 
-                   v.published_at, c.channel_title
-            FROM videos v
-            JOIN channels c ON v.channel_id = c.channel_id
-            ORDER BY v.view_count DESC
-            LIMIT ?
-        """, (limit,))
+        cursor.execute(_SQL['videos'], (limit,))
     
-    rows = cursor.fetchall()
     headers = ['Title', 'Views', 'Likes', 'Comments', 'Published', 'Channel']
     
-    print(f"\n{'='*80}")
+    print(f"\n{BANNER}")
     if channel_title:
         print(f"Videos from channel matching '{channel_title}'")
     else:
         print(f"Top {limit} Videos by Views")
-    print(f"{'='*80}")
+    print(BANNER)
     
-    # Truncate long titles
-    formatted_rows = []
-    for row in rows:
-        title = row[0][:60] + '...' if len(row[0]) > 60 else row[0]
-        channel = row[5][:30] + '...' if len(row[5]) > 30 else row[5]
-        formatted_rows.append([title, row[1], row[2], row[3], row[4][:10], channel])
-    
-    print(tabulate(formatted_rows, headers=headers, tablefmt='grid'))
+    print(_table(cursor, headers, ('left', 'right', 'right', 'right', 'left', 'left')))
 
 
-def view_comments(conn, video_title=None, limit=10):
+def view_comments(cursor, video_title=None, limit=10):
     """View collected comments"""
-    cursor = conn.cursor()
-    
     if video_title:
-        cursor.execute("""
-            SELECT co.author_name, co.text, co.like_count, v.title
-            FROM comments co
-            JOIN videos v ON co.video_id = v.video_id
-            WHERE v.title LIKE ?
-            ORDER BY co.like_count DESC
-            LIMIT ?
-        """, (f'%{video_title}%', limit))
+        cursor.execute(_SQL['comments_by_video'], (f'%{video_title}%', limit))
     else:
-        cursor.execute("""
-            SELECT co.author_name, co.text, co.like_count, v.title
-            FROM comments co
-            JOIN videos v ON co.video_id = v.video_id
-            ORDER BY co.like_count DESC
-            LIMIT ?
-        """, (limit,))
+        cursor.execute(_SQL['comments'], (limit,))
     
-    rows = cursor.fetchall()
     headers = ['Author', 'Comment', 'Likes', 'Video']
     
-    print(f"\n{'='*80}")
+    print(f"\n{BANNER}")
     if video_title:
         print(f"Comments from video matching '{video_title}'")
     else:
         print(f"Top {limit} Comments by Likes")
-    print(f"{'='*80}")
-    
-    # Truncate long text
-    formatted_rows = []
-    for row in rows:
-        author = row[0][:20] + '...' if len(row[0]) > 20 else row[0]
-        comment = row[1][:80] + '...' if len(row[1]) > 80 else row[1]
-        video = row[3][:40] + '...' if len(row[3]) > 40 else row[3]
-        formatted_rows.append([author, comment, row[2], video])
+    print(BANNER)
     
-    print(tabulate(formatted_rows, headers=headers, tablefmt='grid'))
+    print(_table(cursor, headers, ('left', 'left', 'right', 'left')))
 
 
-def show_stats(conn):
-    """Show collection statistics"""
-    cursor = conn.cursor()
-    
-    # Get counts
-    cursor.execute("SELECT COUNT(*) FROM channels")
-    channel_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM videos")
-    video_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM comments")
-    comment_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT SUM(view_count) FROM videos")
-    total_views = cursor.fetchone()[0] or 0
-    
-    cursor.execute("SELECT AVG(view_count) FROM videos WHERE view_count > 0")
-    avg_views = cursor.fetchone()[0] or 0
-    
-    cursor.execute("""
-        SELECT COUNT(DISTINCT author_channel_id) 
-        FROM comments 
-        WHERE author_channel_id IS NOT NULL
-    """)
-    unique_commenters = cursor.fetchone()[0]
-    
-    # Get recent collection runs
-    cursor.execute("""
-        SELECT run_id, start_time, end_time, channels_processed, 
-               videos_collected, comments_collected, quota_used, status
-        FROM collection_runs
-        ORDER BY run_id DESC
-        LIMIT 5
-    """)
-    runs = cursor.fetchall()
+def show_stats(cursor, db_path: Optional[str] = None):
+    """
+    Show collection statistics
+
+    With db_path, the numbers are cached under $XDG_CACHE_HOME (see
+    _stats_cache_path) and reused until the database (or its WAL) is modified.
+    """
+    # Get counts and recent collection runs
+    counts, runs = _load_stats(cursor, db_path)
+    (channel_count, video_count, comment_count,
+     total_views, avg_views, unique_commenters) = counts
+    total_views = total_views or 0
+    avg_views = avg_views or 0
     
-    print(f"\n{'='*80}")
-    print("Database Statistics")
-    print(f"{'='*80}")
-    print(f"Channels:          {channel_count:,}")
-    print(f"Videos:            {video_count:,}")
-    print(f"Comments:          {comment_count:,}")
-    print(f"Total Views:       {total_views:,}")
-    print(f"Avg Views/Video:   {avg_views:,.0f}")
-    print(f"Unique Commenters: {unique_commenters:,}")
+    sys.stdout.write(
+        f"\n{BANNER}\n"
+        "Database Statistics\n"
+        f"{BANNER}\n"
+        f"Channels:          {channel_count:,}\n"
+        f"Videos:            {video_count:,}\n"
+        f"Comments:          {comment_count:,}\n"
+        f"Total Views:       {total_views:,}\n"
+        f"Avg Views/Video:   {avg_views:,.0f}\n"
+        f"Unique Commenters: {unique_commenters:,}\n"
+    )
     
     if runs:
-        print(f"\n{'='*80}")
+        print(f"\n{BANNER}")
         print("Recent Collection Runs")
-        print(f"{'='*80}")
+        print(BANNER)
         headers = ['Run ID', 'Date', 'Channels', 'Videos', 'Comments', 'Quota', 'Status']
         
-        formatted_runs = []
-        for run in runs:
-            date = run[1][:10] if run[1] else 'Unknown'
-            formatted_runs.append([
-                run[0], date, run[3], run[4], run[5], run[6], run[7]
-            ])
+        formatted_runs = [
+            (run_id, start_time[:10] if start_time else 'Unknown',
+             channels, videos, comments, quota, status)
+            for run_id, start_time, _, channels, videos, comments, quota, status in runs
+        ]
         
-        print(tabulate(formatted_runs, headers=headers, tablefmt='grid'))
+        print(_table(formatted_runs, headers,
+                     ('right', 'left', 'right', 'right', 'right', 'right', 'left')))
 
 
 def main():
@@ -206,37 +299,27 @@ def main():
     
     args = parser.parse_args()
     
-    # Connect to database
+    # Connect to database; one cursor serves every view
     conn = connect_db(args.db)
+    cursor = conn.cursor()
+    
+    # Views in display order, each with the option that requests it
+    handlers = (
+        (args.stats, lambda: show_stats(cursor, args.db)),
+        (args.channels, lambda: view_channels(cursor, args.channels)),
+        (args.videos, lambda: view_videos(cursor, args.channel_name, args.videos)),
+        (args.comments, lambda: view_comments(cursor, args.video_title, args.comments)),
+    )
     
     try:
         # If no arguments, show stats by default
-        if not any([args.stats, args.channels, args.videos, args.comments]):
-            show_stats(conn)
-        else:
-            if args.stats:
-                show_stats(conn)
-            
-            if args.channels:
-                view_channels(conn, args.channels)
-            
-            if args.videos:
-                view_videos(conn, args.channel_name, args.videos)
-            
-            if args.comments:
-                view_comments(conn, args.video_title, args.comments)
+        requested = [show for wanted, show in handlers if wanted]
+        for show in requested or [handlers[0][1]]:
+            show()
     
     finally:
         conn.close()
 
 
 if __name__ == "__main__":
-    # Try to import tabulate, suggest install if missing
-    try:
-        from tabulate import tabulate
-    except ImportError:
-        print("Error: 'tabulate' package not found")
-        print("Install it with: pip install tabulate")
-        sys.exit(1)
-    
     main()